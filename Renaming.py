@@ -8,72 +8,221 @@
 #Function : Renaming of srt and video files
 
 import os
+import re
+import json
+import argparse
+from datetime import datetime
+from catalog import Catalog
+
+# Extensions of the files renamed, in lower case
+RENAMED_TYPES = ('.srt', '.mp4')
+
+# Prefix of a renamed file, date_session_drone_ before the DJI name, e.g. 20230312_SE_Lek1_P1D1_DJI_0123.MP4.
+# A file prefixed more than once, or under other folder names, matches up to its last prefix
+RENAMED_PREFIX = re.compile(r'\d{8}_.+_P\d+D\d+_(?=DJI_)')
 
 class FileRenamer:
     def __init__(self, root_folder):
         # Initialize the FileRenamer class with the root folder
         self.root_folder = root_folder
         self.files_found = False  # Flag to track if any files were found
+        self.conflicts = []  # Renames left out of the plan because their new name is taken
+        self.conforming = 0  # Number of files already named after their folders
+
+    def walk(self):
+        """
+        Walks the date/session/drone folders under the root folder once, with os.scandir so the folders are told
+        apart from the files without a stat of every entry.
+
+        Return:
+            Tuples of the drone folder path, the date, session and drone folder names and the names of every file in it
+        """
+        with os.scandir(self.root_folder) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+                with os.scandir(folder.path) as subfolders:
+                    for subfolder in subfolders:
+                        if not subfolder.is_dir():
+                            continue
+                        with os.scandir(subfolder.path) as sub_subfolders:
+                            for sub_subfolder in sub_subfolders:
+                                if not sub_subfolder.is_dir():
+                                    continue
+                                with os.scandir(sub_subfolder.path) as entries:
+                                    files = [entry.name for entry in entries if entry.is_file()]
+                                yield sub_subfolder.path, (folder.name, subfolder.name, sub_subfolder.name), files
+
+    def new_name(self, prefix, file):
+        """
+        Gives the new name of a file, date_session_drone_ followed by the DJI name of the file. The prefix of a file
+        renamed before is replaced, so a file keeps a single prefix, the one of the folders it is in now.
+
+        Args:
+            prefix : Date, session and drone folder names of the file
+            file : Name of the file
+
+        Return:
+            new_file_name : New name of the file, None if it is neither an srt nor an mp4 file
+        """
+        file_name, file_ext = os.path.splitext(file)
+        if file_ext.lower() == '.srt':
+            return f"{'_'.join(prefix)}_{file[-12:-4]}.srt"
+        if file_ext.lower() == '.mp4':
+            match = RENAMED_PREFIX.match(file_name)
+            if match:
+                file_name = file_name[match.end():]
+            return f"{'_'.join(prefix)}_{file_name}{file_ext}"
+        return None
+
+    def conforms(self, prefix, file):
+        """
+        Checks if a file is already named date_session_drone_ after the folders it is in, with a single prefix.
+
+        Args:
+            prefix : Date, session and drone folder names of the file
+            file : Name of the file
+
+        Return:
+            True if the file is already renamed
+        """
+        return RENAMED_PREFIX.match(file) is not None and self.new_name(prefix, file) == file
+
+    def plan_renames(self, file_types=RENAMED_TYPES):
+        """
+        Builds the renames of every srt and mp4 file in a single walk of the tree, without renaming anything.
+
+        Files already named after their folders are left as they are and counted in self.conforming, so the
+        plan of a tree renamed before only holds the files added since.
+
+        A rename whose new name is already a file of the folder, or the new name of another file, would overwrite
+        that file, so it is left out of the plan and kept in self.conflicts instead.
+
+        Args:
+            file_types : Extensions of the files to rename, in lower case
+
+        Return:
+            plan : List of (old path, new path) of the files to rename
+        """
+        plan = []
+        self.conflicts = []
+        self.conforming = 0
+        for folder_path, prefix, files in self.walk():
+            # Names taken in the folder, either by a file or by the new name of another file
+            taken = set(files)
+            for file in files:
+                if os.path.splitext(file)[1].lower() not in file_types:
+                    continue
+                self.files_found = True
+                if self.conforms(prefix, file):
+                    self.conforming += 1
+                    continue
+                new_file_name = self.new_name(prefix, file)
+                if new_file_name == file:
+                    continue
+
+                old_file_path = os.path.join(folder_path, file)
+                new_file_path = os.path.join(folder_path, new_file_name)
+                if new_file_name in taken:
+                    self.conflicts.append((old_file_path, new_file_path))
+                    continue
+                taken.add(new_file_name)
+                plan.append((old_file_path, new_file_path))
+
+        return plan
+
+    def write_journal(self, plan, journal_file):
+        """
+        Saves a plan as a JSON journal, so it can be applied again or undone later.
+
+        Args:
+            plan : List of (old path, new path) of the files to rename
+            journal_file : Path of the JSON journal
+        """
+        journal = {
+            'root folder': os.path.abspath(self.root_folder),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'renames': [{'old': old, 'new': new} for old, new in plan],
+        }
+        with open(journal_file, 'w') as f:
+            json.dump(journal, f, indent=2)
+
+    @staticmethod
+    def read_journal(journal_file):
+        """
+        Reads the plan saved in a JSON journal.
+
+        Args:
+            journal_file : Path of the JSON journal
+
+        Return:
+            plan : List of (old path, new path) of the files to rename
+        """
+        with open(journal_file) as f:
+            journal = json.load(f)
+        return [(rename['old'], rename['new']) for rename in journal['renames']]
+
+    def apply_plan(self, plan, journal_file=None):
+        """
+        Renames every file of a plan. The journal is written before the first rename, so an interrupted run can be
+        finished with replay or undone with rollback.
+
+        Renames whose old file is gone or whose new name is taken are skipped, which makes applying a plan twice harmless.
+
+        Args:
+            plan : List of (old path, new path) of the files to rename
+            journal_file : Path of the JSON journal, None to rename without one
+
+        Return:
+            renamed : List of (old path, new path) of the files renamed
+        """
+        if journal_file:
+            self.write_journal(plan, journal_file)
+
+        renamed = []
+        for old_file_path, new_file_path in plan:
+            if not os.path.exists(old_file_path) or os.path.exists(new_file_path):
+                continue
+            os.rename(old_file_path, new_file_path)
+            renamed.append((old_file_path, new_file_path))
+
+        return renamed
+
+    def replay(self, journal_file):
+        """
+        Applies the renames of a journal that are not done yet.
+
+        Args:
+            journal_file : Path of the JSON journal
+
+        Return:
+            renamed : List of (old path, new path) of the files renamed
+        """
+        return self.apply_plan(self.read_journal(journal_file))
+
+    def rollback(self, journal_file):
+        """
+        Gives the files of a journal their old names back, in the reverse order they were renamed in.
+
+        Args:
+            journal_file : Path of the JSON journal
+
+        Return:
+            renamed : List of (renamed path, old path) of the files given their old names back
+        """
+        plan = self.read_journal(journal_file)
+        return self.apply_plan([(new, old) for old, new in reversed(plan)])
 
     def rename_srt_files(self):
-        srt_files_found = False  # Flag to track if any SRT files were found
-
-        # Iterate through the directory structure to find SRT files
-        for folder_name in os.listdir(self.root_folder):
-            folder_path = os.path.join(self.root_folder, folder_name)
-
-            if os.path.isdir(folder_path):
-                for subfolder_name in os.listdir(folder_path):
-                    subfolder_path = os.path.join(folder_path, subfolder_name)
-
-                    if os.path.isdir(subfolder_path):
-                        for sub_subfolder_name in os.listdir(subfolder_path):
-                            sub_subfolder_path = os.path.join(subfolder_path, sub_subfolder_name)
-
-                            if os.path.isdir(sub_subfolder_path):
-                                files = os.listdir(sub_subfolder_path)
-                                for i, file in enumerate(files, start=1):
-                                    file_name, file_ext = os.path.splitext(file)
-
-                                    if file_ext.lower() == '.srt':
-                                        srt_files_found = True
-                                        self.files_found = True
-                                        # Construct the new file name using f-string
-                                        new_file_name = f"{folder_name}_{subfolder_name}_{sub_subfolder_name}_{file[-12:-4]}.srt"
-                                        new_file_path = os.path.join(sub_subfolder_path, new_file_name)
-                                        old_file_path = os.path.join(sub_subfolder_path, file)
-                                        os.rename(old_file_path, new_file_path)
-
-        if not srt_files_found:
+        # Rename every SRT file found under the root folder
+        self.apply_plan(self.plan_renames(('.srt',)))
+        if not self.files_found:
             print("No SRT files found in the specified directory.")
 
     def rename_mp4_files(self):
-        mp4_files_found = False  # Flag to track if any MP4 files were found
-
-        # Iterate through the directory structure to find MP4 files
-        for folder_name in os.listdir(self.root_folder):
-            folder_path = os.path.join(self.root_folder, folder_name)
-
-            if os.path.isdir(folder_path):
-                for subfolder_name in os.listdir(folder_path):
-                    subfolder_path = os.path.join(folder_path, subfolder_name)
-
-                    if os.path.isdir(subfolder_path):
-                        for sub_subfolder_name in os.listdir(subfolder_path):
-                            sub_subfolder_path = os.path.join(subfolder_path, sub_subfolder_name)
-
-                            if os.path.isdir(sub_subfolder_path):
-                                mp4_files = [f for f in os.listdir(sub_subfolder_path) if f.lower().endswith('.mp4')]
-                                for i, mp4_file in enumerate(mp4_files, start=1):
-                                    mp4_files_found = True
-                                    self.files_found = True
-                                    file_name, file_ext = os.path.splitext(mp4_file)
-                                    new_file_name = f"{folder_name}_{subfolder_name}_{sub_subfolder_name}_{file_name}{file_ext}"
-                                    new_file_path = os.path.join(sub_subfolder_path, new_file_name)
-                                    old_file_path = os.path.join(sub_subfolder_path, mp4_file)
-                                    os.rename(old_file_path, new_file_path)
-
-        if not mp4_files_found:
+        # Rename every MP4 file found under the root folder
+        self.apply_plan(self.plan_renames(('.mp4',)))
+        if not self.files_found:
             print("No MP4 files found in the specified directory.")
 
     def display_message(self, file_type):
@@ -83,30 +232,60 @@ class FileRenamer:
             print(f"{file_type} files successfully renamed.")
 
 def main():
-    # srt_root_folder = input("Enter the file location for SRT: ")
-
-    srt_root_folder = "D:\\MELA\\Renaming_data\\20230312\\SE_Lek1\\P1D1"
+    parser = argparse.ArgumentParser(description='Renames the srt and mp4 files as date_session_drone_filename')
+    parser.add_argument('root_folder', nargs='?', default="D:\\MELA\\Renaming_data\\20230312\\SE_Lek1\\P1D1", help='Folder holding the date/session/drone folders')
+    parser.add_argument('--dry-run', action='store_true', help='Print the renames without renaming anything')
+    parser.add_argument('--journal', help='JSON file the renames are saved to before they are applied')
+    parser.add_argument('--catalog', help='SQLite catalog the renames are saved to, shared with srtanalyzer and videocorruption')
+    parser.add_argument('--replay', metavar='JOURNAL', help='Apply the renames of a journal that are not done yet')
+    parser.add_argument('--rollback', metavar='JOURNAL', help='Give the files of a journal their old names back')
+    args = parser.parse_args()
+
+    renamer = FileRenamer(args.root_folder)
+
+    # Finish or undo an earlier run from its journal, the catalog only follows the renames that were done
+    if args.replay:
+        renamed = renamer.replay(args.replay)
+        if args.catalog:
+            catalog = Catalog(args.catalog)
+            catalog.add_renames(renamed)
+            catalog.close()
+        print(f"{len(renamed)} files renamed from {args.replay}.")
+        return
+    if args.rollback:
+        renamed = renamer.rollback(args.rollback)
+        if args.catalog:
+            catalog = Catalog(args.catalog)
+            catalog.undo_renames(renamed)
+            catalog.close()
+        print(f"{len(renamed)} files given their old names back from {args.rollback}.")
+        return
 
     # Check if the entered directory exists and is a valid directory
-    if not os.path.exists(srt_root_folder) or not os.path.isdir(srt_root_folder):
-        print(f"Warning: The specified directory '{srt_root_folder}' does not exist or is not a valid directory for SRT files.")
-    else:
-        srt_renamer = FileRenamer(srt_root_folder)
-        srt_renamer.rename_srt_files()
-        srt_renamer.display_message("SRT")
-    
-    # video_root_folder = input("Enter the folder location of video files: ")
+    if not os.path.isdir(args.root_folder):
+        print(f"Error: The specified directory '{args.root_folder}' does not exist or is not a valid directory.")
+        return
 
-    video_root_folder = "D:\\MELA\\Renaming_data\\20230312\\SE_Lek1\\P1D1"
+    # Plan the renames of both file types in one walk of the tree
+    plan = renamer.plan_renames()
+    for old_file_path, new_file_path in renamer.conflicts:
+        print(f"Skipped {old_file_path}: {os.path.basename(new_file_path)} already exists.")
 
-    # Check if the entered directory exists and is a valid directory
-    if video_root_folder and (not os.path.exists(video_root_folder) or not os.path.isdir(video_root_folder)):
-        print(f"Error: The specified directory '{video_root_folder}' does not exist or is not a valid directory for video files.")
+    if renamer.conforming:
+        print(f"{renamer.conforming} files are already renamed.")
+
+    if args.dry_run:
+        for old_file_path, new_file_path in plan:
+            print(f"{old_file_path} -> {os.path.basename(new_file_path)}")
+        print(f"{len(plan)} files would be renamed.")
         return
 
-    mp4_renamer = FileRenamer(video_root_folder)
-    mp4_renamer.rename_mp4_files()
-    mp4_renamer.display_message("MP4")
+    renamed = renamer.apply_plan(plan, args.journal)
+    if args.catalog:
+        catalog = Catalog(args.catalog)
+        catalog.add_renames(renamed)
+        catalog.close()
+    renamer.display_message("SRT and MP4")
 
 if __name__ == "__main__":
     main()
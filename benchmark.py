@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#Function : generate synthetic drone sessions and time every step of srtanalyzer on them
+import os
+import glob
+import sys
+import json
+import shutil
+import tempfile
+import platform
+import argparse
+from time import perf_counter
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+from srtanalyzer import DataProcessor, SrtCache, parse_srt, geodesic_distance
+
+# Degrees of latitude in a metre, used to turn the injected drift into coordinates
+DEGREES_PER_METRE = 1 / 111320
+
+# Time between the end of a video and the start of the next one of the same flight, in microseconds
+VIDEO_GAP = 500000
+
+# Time the next drone of a relay starts recording before the current one lands, in microseconds
+RELAY_OVERLAP = 30000000
+
+# Positions of the sessions, srtanalyzer expects the three positions P1 to P3
+POSITIONS = 3
+
+# Steps of DataProcessor in the order srtanalyzer runs them
+STAGES = ['sortedfolders', 'dataframecreation', 'rearrangecolumns', 'missingdata', 'dronenumber', 'sortieid',
+          'startendtime', 'startendfile', 'startendframe', 'framedrop', 'savecsv', 'savetext', 'plot']
+
+
+class SessionGenerator:
+    """
+    Writes DJI style srt files of a synthetic recording session, laid out as <date>/<site>_<session>/<PxDy>/DJI_xxxx.SRT
+
+    Every position has two drones relaying each other: the first drone flies, the second one takes off before the
+    first one lands, and so on for the number of relays. Every flight is split into videos of a fixed length.
+    """
+    def __init__(self, positions=3, relays=1, flight_minutes=20, video_minutes=10, fps=30, drift=0.0, drop_every=0,
+                 altitude=80.0, seed=0):
+        """
+        Args:
+            positions : Number of positions recorded at the same time, srtanalyzer only analyses sessions of 3
+            relays : Number of times the drones of a position hand over to each other
+            flight_minutes : Length of every flight
+            video_minutes : Length of the videos a flight is split into
+            fps : Frames per second of the videos, 30 or 60
+            drift : Drift injected into the first flight of every position, in metres per minute
+            drop_every : Drop one frame out of every drop_every frames of the first flight, 0 to keep every frame
+            altitude : Altitude the drones hover at, in metres
+            seed : Seed of the noise added to the positions and altitudes
+        """
+        self.positions = positions
+        self.relays = relays
+        self.flight_minutes = flight_minutes
+        self.video_minutes = video_minutes
+        self.fps = fps
+        self.drift = drift
+        self.drop_every = drop_every
+        self.altitude = altitude
+        self.seed = seed
+
+    def write_srt(self, file_path, start, frames, drift=0.0, drop_every=0, rng=None):
+        """
+        Writes one srt file.
+
+        Args:
+            file_path : Path of the srt file
+            start : Time of the first frame, in microseconds since midnight
+            frames : Number of frames of the video
+            drift : Drift of the drone, in metres per minute
+            drop_every : Drop one frame out of every drop_every frames, 0 to keep every frame
+            rng : numpy random generator of the noise
+
+        Return:
+            written : Number of frames written to the file
+        """
+        index = np.arange(frames)
+        if drop_every:
+            index = index[(index == 0) | (index % drop_every != 0)]
+
+        # Time of every frame since midnight and since the start of the video
+        frame_us = 1000000 / self.fps
+        timestamps = start + (index * frame_us).astype(np.int64)
+        begin_ms = (index * 1000 / self.fps).astype(np.int64)
+        end_ms = ((index + 1) * 1000 / self.fps).astype(np.int64)
+
+        # Hover around a fixed point with some noise, moving away with the drift
+        minutes = index / self.fps / 60
+        latitudes = -0.6 + rng.uniform(-1e-7, 1e-7, len(index)) + drift * minutes * DEGREES_PER_METRE
+        longitudes = 36.08 + rng.uniform(-1e-7, 1e-7, len(index))
+        altitudes = self.altitude + rng.uniform(-0.5, 0.5, len(index))
+
+        blocks = []
+        for count, (timestamp, begin, end, lat, lon, alt) in enumerate(zip(timestamps.tolist(), begin_ms.tolist(), end_ms.tolist(), latitudes.tolist(), longitudes.tolist(), altitudes.tolist()), 1):
+            blocks.append(
+                f"{count}\n"
+                f"{clock(begin * 1000)[:12]} --> {clock(end * 1000)[:12]}\n"
+                f"<font size=\"36\">FrameCnt : {count}, DiffTime : {int(frame_us) // 1000}ms\n"
+                f"2023-03-12 {clock(timestamp)}\n"
+                f"[iso : 110] [shutter : 1/1000.0] [fnum : 280] [ev : 0] [ct : 5064] [color_md : default] [focal_len : 240] "
+                f"[latitude: {lat:.6f}] [longitude: {lon:.6f}] [altitude: {alt:.6f}] </font>\n\n"
+            )
+
+        with open(file_path, 'w') as f:
+            f.write(''.join(blocks))
+
+        return len(index)
+
+    def generate(self, root, date='20230312', session='SE_Lek1', start=7 * 3600000000):
+        """
+        Writes every srt file of the session.
+
+        Args:
+            root : Folder the date folder of the session is written to
+            date : Date folder of the session
+            session : Site and session folder of the session
+            start : Time the first drone of every position starts recording, in microseconds since midnight
+
+        Return:
+            session_location : Folder of the session
+            frames : Number of frames written
+        """
+        session_location = os.path.join(root, date, session)
+        rng = np.random.default_rng(self.seed)
+        flight_us = int(self.flight_minutes * 60000000)
+        video_us = int(self.video_minutes * 60000000)
+        video_id = 0
+        frames = 0
+
+        for position in range(1, self.positions + 1):
+            drones = [f'P{position}D{2 * position - 1}', f'P{position}D{2 * position}']
+            for drone in drones:
+                os.makedirs(os.path.join(session_location, drone), exist_ok=True)
+
+            # The positions start a few seconds apart, like the drones taking off one after the other
+            flight_start = start + (position - 1) * 3123457
+            for flight in range(self.relays + 1):
+                drone = drones[flight % 2]
+
+                # Split the flight into videos
+                video_start = flight_start
+                while video_start < flight_start + flight_us:
+                    length = min(video_us, flight_start + flight_us - video_start)
+                    video_id += 1
+                    file_path = os.path.join(session_location, drone, f'DJI_{video_id:04d}.SRT')
+                    frames += self.write_srt(file_path, video_start, int(length * self.fps / 1000000),
+                                             drift=self.drift if flight == 0 else 0.0,
+                                             drop_every=self.drop_every if flight == 0 else 0, rng=rng)
+                    video_start += length + VIDEO_GAP
+
+                flight_start += flight_us - RELAY_OVERLAP
+
+        return session_location, frames
+
+
+def clock(microseconds):
+    """
+    Formats microseconds as HH:MM:SS,mmm,uuu like the timestamps of the srt files.
+    """
+    seconds, micro = divmod(int(microseconds), 1000000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return f"{hour:02d}:{minute:02d}:{second:02d},{micro // 1000:03d},{micro % 1000:03d}"
+
+
+def time_stages(session_location, args):
+    """
+    Runs every step of srtanalyzer on a session, timing each one.
+
+    Args:
+        session_location : Folder of the session
+        args : Parsed command line arguments
+
+    Return:
+        timings : Dictionary of the step name to the seconds it took
+    """
+    data_processor = DataProcessor()
+    data_processor.session_location = session_location
+    data_processor.args = argparse.Namespace(showplot=False)
+    cache = SrtCache(args.cache) if args.cache else None
+
+    timings = {}
+    for stage in STAGES:
+        method = getattr(data_processor, stage)
+        begin = perf_counter()
+        if stage == 'dataframecreation':
+            method(5, 7, args.workers, cache)
+        else:
+            method()
+        timings[stage] = perf_counter() - begin
+
+    return timings
+
+
+def time_parsing(session_location):
+    """
+    Times the parsing and the drift of the srt files of a session on their own.
+
+    Args:
+        session_location : Folder of the session
+
+    Return:
+        timings : Seconds spent parsing the files and computing the drift distances
+    """
+    files = sorted(glob.glob(os.path.join(session_location, '*', '*.SRT')))
+
+    parse = 0.0
+    drift = 0.0
+    for file in files:
+        begin = perf_counter()
+        columns = parse_srt(file)
+        parse += perf_counter() - begin
+
+        begin = perf_counter()
+        geodesic_distance(columns['latitude'].mean(), columns['longitude'].mean(), columns['latitude'], columns['longitude'])
+        drift += perf_counter() - begin
+
+    return {'parse': parse, 'drift': drift}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times srtanalyzer on synthetic sessions of growing size')
+    parser.add_argument('--minutes', type=float, nargs='+', default=[5, 30, 120], help='Flight lengths to benchmark, in minutes (default is 5 30 120)')
+    parser.add_argument('--relays', type=int, default=1, help='Number of relays per position, at least 1 so both drones of a position fly (default is 1)')
+    parser.add_argument('--video-minutes', type=float, default=10, help='Length of every video in minutes (default is 10)')
+    parser.add_argument('--fps', type=int, default=30, choices=[30, 60], help='Frames per second (default is 30)')
+    parser.add_argument('--drift', type=float, default=0.5, help='Drift of the first flight in metres per minute (default is 0.5)')
+    parser.add_argument('--drop-every', type=int, default=0, help='Drop one frame out of every DROP_EVERY in the first flight (default is 0, no drops)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size, the fastest one is kept (default is 3)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes parsing the srt files (default is 1)')
+    parser.add_argument('--cache', help='Folder caching the parsed srt files, reused between the runs of a size')
+    parser.add_argument('--root', help='Folder the sessions are written to (default is a temporary folder, removed at the end)')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file the results are written to (default is benchmark_results.json)')
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix='srtbench_')
+    results = []
+
+    try:
+        for size, minutes in enumerate(args.minutes):
+            generator = SessionGenerator(positions=POSITIONS, relays=args.relays, flight_minutes=minutes,
+                                         video_minutes=args.video_minutes, fps=args.fps, drift=args.drift,
+                                         drop_every=args.drop_every, seed=size)
+
+            begin = perf_counter()
+            session_location, frames = generator.generate(os.path.join(root, f'size{size}'))
+            generate_time = perf_counter() - begin
+            footage_hours = POSITIONS * (args.relays + 1) * minutes / 60
+            print(f"Generated {footage_hours:.2f} hours of footage, {frames} frames, in {generate_time:.1f}s")
+
+            # Keep the fastest run of every step
+            best = {}
+            for _ in range(args.repeat):
+                timings = time_parsing(session_location)
+                timings.update(time_stages(session_location, args))
+                timings['total'] = sum(timings[stage] for stage in STAGES)
+                for stage, seconds in timings.items():
+                    best[stage] = min(best.get(stage, seconds), seconds)
+
+            for stage, seconds in best.items():
+                results.append({
+                    'flight minutes': minutes,
+                    'footage hours': footage_hours,
+                    'frames': frames,
+                    'stage': stage,
+                    'seconds': seconds,
+                    'frames per second': frames / seconds if seconds > 0 else None,
+                })
+            print(pd.Series(best).round(4).to_string())
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'settings': {name: value for name, value in vars(args).items() if name not in ('root', 'output')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved the results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+#Function : SQLite catalog of the files, recordings and video verdicts of every session, filled by srtanalyzer,
+#videocorruption and Renaming so questions across sessions can be answered without running them again
+import os
+import sqlite3
+import argparse
+from datetime import datetime
+import pandas as pd
+
+# Seconds a tool waits for another one writing to the catalog, e.g. the sessions of a season analysed in processes
+CATALOG_TIMEOUT = 60
+
+# Tables of the catalog, every one indexed by the date, site, position and drone of its rows.
+# Dates are kept as the YYYYMMDD folder names so a month is a range, e.g. date BETWEEN '20230301' AND '20230331',
+# and the times of the recordings in microseconds since midnight like in srtanalyzer
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, kind TEXT, date TEXT, site TEXT, position TEXT, drone TEXT, video_id TEXT,
+    size INTEGER, mtime_ns INTEGER, seen TEXT
+);
+CREATE INDEX IF NOT EXISTS files_location ON files (date, site, position, drone);
+
+CREATE TABLE IF NOT EXISTS recordings (
+    unique_name TEXT PRIMARY KEY, date TEXT, site TEXT, position TEXT, drone TEXT, video_id TEXT, path TEXT,
+    flight_number INTEGER, relay_video INTEGER, total_frames INTEGER, start_timestamp INTEGER, end_timestamp INTEGER,
+    frame_time REAL, maximum_drift REAL, drift_status INTEGER, miss_click INTEGER, maximum_height REAL,
+    minimum_height REAL, start_frame INTEGER, end_frame INTEGER, frame_drop INTEGER, analysed TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_location ON recordings (date, site, position, drone);
+
+CREATE TABLE IF NOT EXISTS verdicts (
+    path TEXT, level TEXT, date TEXT, site TEXT, position TEXT, drone TEXT, video_id TEXT, size INTEGER,
+    mtime_ns INTEGER, corrupted INTEGER, error TEXT, frame_count INTEGER, duration REAL, checked TEXT,
+    PRIMARY KEY (path, level)
+);
+CREATE INDEX IF NOT EXISTS verdicts_location ON verdicts (date, site, position, drone);
+
+CREATE TABLE IF NOT EXISTS renames (
+    new_path TEXT PRIMARY KEY, old_path TEXT, date TEXT, site TEXT, position TEXT, drone TEXT, renamed TEXT
+);
+CREATE INDEX IF NOT EXISTS renames_location ON renames (date, site, position, drone);
+"""
+
+# Replaces the verdict of a video at a check level. The box check of videocorruption does not read the frame count
+# and duration srtanalyzer reads, so the ones already known are kept as long as the file did not change
+VERDICT_UPSERT = """
+INSERT INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (path, level) DO UPDATE SET
+    date = excluded.date, site = excluded.site, position = excluded.position, drone = excluded.drone,
+    video_id = excluded.video_id, corrupted = excluded.corrupted, error = excluded.error, checked = excluded.checked,
+    frame_count = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns THEN COALESCE(excluded.frame_count, frame_count) ELSE excluded.frame_count END,
+    duration = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns THEN COALESCE(excluded.duration, duration) ELSE excluded.duration END,
+    size = excluded.size, mtime_ns = excluded.mtime_ns
+"""
+
+# Columns of the recordings table and the df_day columns of srtanalyzer they are read from
+RECORDING_COLUMNS = {
+    'flight_number': 'flight number',
+    'relay_video': 'Relay video',
+    'total_frames': 'Total frames',
+    'start_timestamp': 'start_timestamp',
+    'end_timestamp': 'end_timestamp',
+    'frame_time': 'Frame time',
+    'maximum_drift': 'maximum drift',
+    'drift_status': 'drift_status',
+    'miss_click': 'Miss click',
+    'maximum_height': 'maximum height',
+    'minimum_height': 'minimum height',
+    'start_frame': 'Start Frame',
+    'end_frame': 'End Frame',
+    'frame_drop': 'Frame drop',
+}
+
+
+def file_location(file_path):
+    """
+    Reads the date, site, position and drone of a file from the folders it is in, <date>/<site>/<PxDy>/<file>,
+    and its Video_ID from its name, which holds the DJI name last whether it was renamed or not.
+
+    Args:
+        file_path : Path of an srt or mp4 file
+
+    Return:
+        location : Tuple of the date, site, position, drone and Video_ID of the file
+    """
+    parts = os.path.normpath(os.path.abspath(file_path)).split(os.sep)
+    folder = parts[-2][-4:]
+    return parts[-4], parts[-3], folder[:2], folder[2:], os.path.splitext(parts[-1])[0][-8:]
+
+
+def to_value(value):
+    """
+    Turns a numpy or pandas value into a value SQLite can store, None for missing values.
+    """
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+class Catalog:
+    """
+    SQLite catalog shared by the three tools. Every write replaces the rows of the same file or recording, so running
+    a tool again on a session only updates what changed.
+    """
+    def __init__(self, catalog_file):
+        """
+        Args:
+            catalog_file : Path of the SQLite database, created if it does not exist
+        """
+        self.catalog_file = catalog_file
+        self.connection = sqlite3.connect(catalog_file, timeout=CATALOG_TIMEOUT)
+
+        # Let the tools read while another one writes
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(CATALOG_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_files(self, file_paths, kind):
+        """
+        Adds or updates files with their size and modification time.
+
+        Args:
+            file_paths : Paths of the files
+            kind : 'srt' or 'mp4'
+        """
+        seen = datetime.now().isoformat(timespec='seconds')
+        rows = []
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            rows.append((os.path.abspath(file_path), kind, *file_location(file_path), stat.st_size, stat.st_mtime_ns, seen))
+
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def add_session(self, session_location, srt_paths, video_paths, df_day):
+        """
+        Replaces the files and recordings of a session with the ones srtanalyzer just found, so files removed
+        from the session leave the catalog as well.
+
+        Args:
+            session_location : Folder of the session
+            srt_paths : Paths of the srt files of the session
+            video_paths : Paths of the mp4 files of the session
+            df_day : data frame of the session, one row per recording, as saved by savecsv
+        """
+        session = os.path.normpath(os.path.abspath(session_location))
+        date, site = os.path.basename(os.path.dirname(session)), os.path.basename(session)
+        analysed = datetime.now().isoformat(timespec='seconds')
+
+        # The File path column of df_day is the drone folder, the srt file of a recording is found from its Video_ID
+        srt_files = {(os.path.basename(os.path.dirname(file))[-4:], os.path.basename(file)[-12:-4]): file for file in srt_paths}
+
+        rows = []
+        for record in df_day.to_dict('records'):
+            file_path = srt_files.get((record['position'] + record['drone'], record['Video_ID']), record['File path'])
+            rows.append((record['Unique name'], date, site, record['position'], record['drone'], record['Video_ID'],
+                         os.path.abspath(file_path), *(to_value(record.get(column)) for column in RECORDING_COLUMNS.values()), analysed))
+
+        with self.connection:
+            self.connection.execute('DELETE FROM files WHERE date = ? AND site = ?', (date, site))
+            self.connection.execute('DELETE FROM recordings WHERE date = ? AND site = ?', (date, site))
+            self.connection.executemany(f"INSERT OR REPLACE INTO recordings VALUES ({', '.join('?' * (len(RECORDING_COLUMNS) + 8))})", rows)
+
+            # The recordings have to be found by the date and site of the session, or they are never replaced
+            found = self.connection.execute('SELECT COUNT(*) FROM recordings WHERE date = ? AND site = ?', (date, site)).fetchone()[0]
+            if found != len(rows):
+                raise ValueError(f"Only {found} of the {len(rows)} recordings of {session} are found by its date {date} and site {site}")
+        self.add_files(srt_paths, 'srt')
+        self.add_files(video_paths, 'mp4')
+
+    def add_verdicts(self, verdicts, level='container'):
+        """
+        Adds or updates the verdicts of checked videos.
+
+        Args:
+            verdicts : Dictionary of the path of every video to a dictionary of its corrupted flag, error and
+            optionally frame count and duration
+            level : 'container' for the box check, 'deepN' for the deep check decoding N frames
+        """
+        checked = datetime.now().isoformat(timespec='seconds')
+        rows = []
+        for video_path, verdict in verdicts.items():
+            stat = os.stat(video_path)
+            rows.append((os.path.abspath(video_path), level, *file_location(video_path), stat.st_size, stat.st_mtime_ns,
+                         to_value(verdict.get('corrupted')), verdict.get('error'), to_value(verdict.get('frame count')),
+                         to_value(verdict.get('duration')), checked))
+
+        with self.connection:
+            self.connection.executemany(VERDICT_UPSERT, rows)
+        self.add_files(list(verdicts), 'mp4')
+
+    def move_files(self, plan):
+        """
+        Moves the files, verdicts and recordings of the old names of renamed files to their new names.
+
+        Args:
+            plan : List of (old path, new path) of the renamed files, as absolute paths
+        """
+        with self.connection:
+            self.connection.executemany('DELETE FROM files WHERE path = ?', [(new,) for old, new in plan])
+            self.connection.executemany('UPDATE files SET path = ? WHERE path = ?', [(new, old) for old, new in plan])
+            self.connection.executemany('DELETE FROM verdicts WHERE path = ?', [(new,) for old, new in plan])
+            self.connection.executemany('UPDATE verdicts SET path = ? WHERE path = ?', [(new, old) for old, new in plan])
+            self.connection.executemany('UPDATE recordings SET path = ? WHERE path = ?', [(new, old) for old, new in plan])
+
+        for kind in ('srt', 'mp4'):
+            self.add_files([new for old, new in plan if new.lower().endswith(f'.{kind}') and os.path.exists(new)], kind)
+
+    def add_renames(self, plan):
+        """
+        Records the renames of Renaming and moves the files and verdicts of the old names to the new ones.
+
+        Args:
+            plan : List of (old path, new path) of the files that were renamed
+        """
+        renamed = datetime.now().isoformat(timespec='seconds')
+        plan = [(os.path.abspath(old), os.path.abspath(new)) for old, new in plan]
+
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO renames VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        [(new, old, *file_location(new)[:4], renamed) for old, new in plan])
+        self.move_files(plan)
+
+    def undo_renames(self, plan):
+        """
+        Forgets the renames given back by a rollback of Renaming and moves the files and verdicts back to their old names.
+
+        Args:
+            plan : List of (renamed path, old path) of the files that were given their old names back
+        """
+        plan = [(os.path.abspath(new), os.path.abspath(old)) for new, old in plan]
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM renames WHERE new_path = ?', [(new,) for new, old in plan])
+        self.move_files(plan)
+
+    def query(self, sql, params=()):
+        """
+        Runs a query on the catalog.
+
+        Args:
+            sql : SQL query, e.g. SELECT * FROM recordings WHERE relay_video = 1 AND maximum_drift > 5
+            params : Values of the ? of the query
+
+        Return:
+            df : data frame of the rows found
+        """
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Queries the catalog filled by srtanalyzer, videocorruption and Renaming')
+    parser.add_argument('catalog_file', help='SQLite catalog')
+    parser.add_argument('sql', nargs='?', help='SQL query to run (default is the number of rows of every table)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.catalog_file):
+        print(f"The catalog '{args.catalog_file}' does not exist.")
+        return
+
+    catalog = Catalog(args.catalog_file)
+    if args.sql:
+        print(catalog.query(args.sql).to_string())
+    else:
+        for table in ('files', 'recordings', 'verdicts', 'renames'):
+            print(f"{table}: {catalog.query(f'SELECT COUNT(*) AS n FROM {table}')['n'][0]} rows")
+    catalog.close()
+
+if __name__ == "__main__":
+    main()
@@ -6,22 +6,1055 @@
 #Author : Dipin
 #Function : analyze the srt files of recording session
 import re
+import sys
 import glob
 import os
+import mmap
+import hashlib
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from datetime import datetime
-from geopy import distance
+from datetime import time
 import argparse
+import traceback
+import json
+import cProfile
+import tracemalloc
+from time import sleep, perf_counter, process_time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from videocorruption import summarise_video
+from catalog import Catalog
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak memory of the process is left out of the profile
+    resource = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Only needed to export the frames as Parquet
+    pa = None
+
+# WGS-84 ellipsoid used for the drift distances
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Number of characters read from an srt file at a time
+SRT_CHUNK_SIZE = 1 << 22
+
+# Columns of the frame table of a session and the compact type each one is stored in. The coordinates stay float64:
+# the srt files give 6 decimals, about 0.1 m, and float32 would round them by up to about 0.4 m at these longitudes
+FRAME_TABLE_COLUMNS = {
+    'frame': np.int32,
+    'timestamp': np.int64,
+    'frame_time': np.int64,
+    'latitude': np.float64,
+    'longitude': np.float64,
+    'altitude': np.float64,
+    'distance': np.float64,
+}
+
+# Rows per row group of the Parquet export, each row group carrying the minimum and maximum of every column
+PARQUET_ROW_GROUP_SIZE = 1 << 16
+
+# Columns added to the session by the check of the videos against the srt files
+VIDEO_COLUMNS = ['Video file', 'Missing video', 'Video corrupted', 'Video error', 'Video frames', 'Video duration', 'Frame count mismatch', 'Duration mismatch']
+
+# Frames and seconds the video and the srt file of a recording may differ by before it is reported
+VIDEO_FRAME_TOLERANCE = 1
+VIDEO_DURATION_TOLERANCE = 0.1
+
+# Number of bytes read from the head and from the tail of an srt file by a scan, doubled until a whole block fits
+SRT_SCAN_SIZE = 1 << 13
+
+# Version of the parsed srt data, part of the cache key so old entries are not reused after a change
+SRT_PARSER_VERSION = 2
+
+# Default limit of the total size of the srt cache, in megabytes
+SRT_CACHE_SIZE = 2048
+
+# Columns of the per frame data frame and the type each one is stored in.
+# timestamp and frame_time are kept as microseconds, since midnight and since the start of the video
+SRT_COLUMNS = {
+    'frame': np.int64,
+    'timestamp': np.int64,
+    'latitude': np.float64,
+    'longitude': np.float64,
+    'altitude': np.float64,
+    'frame_time': np.int64,
+}
+
+# Patterns of the frame fields inside an srt block, matched on the bytes of the file
+SRT_FRAME_PATTERN = re.compile(rb'(\d+)\n.*?(\d{2}:\d{2}:\d{2},\d{3},\d{3}).*?\[latitude:\s*([-+]?\d+\.\d+)\]\s*\[longitude:\s*([-+]?\d+\.\d+)\]\s*\[altitude:\s*([-+]?\d+\.\d+)\]', re.DOTALL)
+SRT_FRAME_TIME_PATTERN = re.compile(rb'\d{2}:\d{2}:\d{2},\d{3} --> (\d{2}:\d{2}:\d{2},\d{3})')
+SRT_TIMESTAMP_PATTERN = re.compile(rb'\d{2}:\d{2}:\d{2},\d{3},\d{3}')
+SRT_POSITION_PATTERN = re.compile(rb'\[latitude:\s*([-+]?\d+\.\d+)\]\s*\[longitude:\s*([-+]?\d+\.\d+)\]\s*\[altitude:\s*([-+]?\d+\.\d+)\]')
+
+# Layout of the clocks cut out of every block, the frame times use the first 12 characters, 0 standing for a digit
+SRT_CLOCK_TEMPLATE = np.frombuffer(b'00:00:00,000,000', dtype=np.uint8)
+
+# Most digits a coordinate may have to be converted exactly as an integer divided by a power of ten
+SRT_DECIMAL_DIGITS = 15
+
+
+def clock_to_microseconds(values):
+    """
+    Converts srt clock strings to microseconds.
+
+    Args:
+        values (list): Byte strings of the same width, either "HH:MM:SS,mmm" or "HH:MM:SS,mmm,uuu".
+
+    Returns:
+        numpy.ndarray: The times as int64 microseconds.
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    width = len(values[0])
+    digits = np.frombuffer(b''.join(values), dtype=np.uint8).reshape(-1, width).astype(np.int64) - ord('0')
+
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 3] * 10 + digits[:, 4]
+    seconds = digits[:, 6] * 10 + digits[:, 7]
+    microseconds = (digits[:, 9] * 100 + digits[:, 10] * 10 + digits[:, 11]) * 1000
+    if width > 12:
+        microseconds += digits[:, 13] * 100 + digits[:, 14] * 10 + digits[:, 15]
+
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000000 + microseconds
+
+
+def fixed_width_chars(values):
+    """
+    Stacks byte strings cut at the same place of every srt block into one row of characters per block.
+
+    Args:
+        values (list): Byte strings, all as wide as the first one unless a line was too short for the cut.
+
+    Returns:
+        numpy.ndarray: uint8 array of one row per string, or None if the strings are not all the same width.
+    """
+    width = len(values[0])
+    chars = np.frombuffer(b''.join(values), dtype=np.uint8)
+
+    # The cuts are never wider than the first one, so the total length tells if one is narrower
+    if width == 0 or len(chars) != width * len(values):
+        return None
+    return chars.reshape(-1, width)
+
+
+def clock_column_valid(values):
+    """
+    Checks that clock strings cut out of the srt blocks all have the layout of an srt clock.
+
+    Args:
+        values (list): Byte strings cut at the same place of every block, "HH:MM:SS,mmm" or "HH:MM:SS,mmm,uuu".
+
+    Returns:
+        bool: True if every string is a clock of the width of the first one.
+    """
+    chars = fixed_width_chars(values)
+    if chars is None or chars.shape[1] not in (12, 16):
+        return False
+
+    width = chars.shape[1]
+    template = SRT_CLOCK_TEMPLATE[:width]
+    separators = template != ord('0')
+
+    # Bytes below '0' wrap around in uint8, so one comparison checks the digits
+    return bool((chars[:, separators] == template[separators]).all() and ((chars[:, ~separators] - ord('0')) <= 9).all())
+
+
+def parse_decimals(chars):
+    """
+    Converts decimal numbers cut out of the srt blocks at the same place, e.g. b'-0.600012', to floats at once.
+
+    The digits are read as an integer and divided by the power of ten of the decimals, which gives the same
+    float as parsing the text as long as the integer is exact.
+
+    Args:
+        chars (numpy.ndarray): uint8 array of the characters of one number per row.
+
+    Returns:
+        numpy.ndarray: The numbers as float64, or None if they do not all have the layout of the first one,
+        e.g. the altitude going past 100 m in the middle of the values.
+    """
+    first = chars[0].tobytes()
+    width = len(first)
+    dot = first.find(b'.')
+    negative = first.startswith(b'-')
+    digit_columns = [i for i in range(int(negative), width) if i != dot]
+    if dot <= int(negative) or dot == width - 1 or len(digit_columns) > SRT_DECIMAL_DIGITS:
+        return None
+
+    digits = chars[:, digit_columns] - ord('0')
+    if not ((chars[:, dot] == ord('.')).all() and (digits <= 9).all() and (not negative or (chars[:, 0] == ord('-')).all())):
+        return None
+
+    mantissa = digits.astype(np.int64) @ (10 ** np.arange(len(digit_columns) - 1, -1, -1, dtype=np.int64))
+    numbers = mantissa / 10.0 ** (width - dot - 1)
+    return -numbers if negative else numbers
+
+
+def format_timestamp(microseconds):
+    """
+    Formats microseconds since midnight the way the srt files write them, "HH:MM:SS,mmm,uuu".
+    """
+    seconds, microseconds = divmod(int(microseconds), 1000000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{microseconds // 1000:03d},{microseconds % 1000:03d}"
+
+
+def format_common_time(microseconds):
+    """
+    Formats microseconds since midnight as "HH:MM:SS,ffffff" so the csv file is not rounded up.
+    """
+    seconds, microseconds = divmod(int(microseconds), 1000000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{microseconds:06d}"
+
+
+def microseconds_to_time(microseconds):
+    """
+    Converts microseconds since midnight to a datetime.time.
+    """
+    seconds, microseconds = divmod(int(microseconds), 1000000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return time(hours, minutes, seconds, microseconds)
+
+
+def frame_time_to_seconds(microseconds):
+    """
+    Converts frame times in microseconds to seconds, adding the fraction to the whole seconds.
+    """
+    return microseconds // 1000000 + (microseconds % 1000000) / 1000000
+
+
+def srt_block_layout(lines):
+    """
+    Finds where the frame fields are in the first block of a list of srt lines.
+
+    Args:
+        lines (list): Lines of complete srt blocks as bytes, starting at the frame number of the first block.
+
+    Returns:
+        tuple: Lines per block, span of the frame time in the second line, line and span of the timestamp,
+        line of the coordinates and spans of the latitude, longitude and altitude counted from the end of that line,
+        or None if the first block does not hold all the fields.
+    """
+    if b'' not in lines:
+        return None
+
+    # Lines per block including the blank line closing it
+    block_size = lines.index(b'') + 1
+    block = lines[:block_size - 1]
+
+    if len(block) < 3 or not block[0].isdigit():
+        return None
+
+    frame_time_match = SRT_FRAME_TIME_PATTERN.match(block[1])
+    timestamp = None
+    position_line = None
+
+    for i, line in enumerate(block[1:], start=1):
+        if timestamp is None:
+            timestamp_match = SRT_TIMESTAMP_PATTERN.search(line)
+            if timestamp_match:
+                timestamp = (i, timestamp_match.span())
+        position_match = SRT_POSITION_PATTERN.search(line) if timestamp is not None else None
+        if position_match:
+            position_line = i
+            break
+
+    if frame_time_match is None or position_line is None:
+        return None
+
+    # The coordinates are at the end of their line, after fields such as iso and shutter whose width changes
+    position_spans = [(position_match.start(group) - len(line), position_match.end(group) - len(line)) for group in (1, 2, 3)]
+
+    return block_size, frame_time_match.span(1), timestamp[0], timestamp[1], position_line, position_spans
+
+
+def parse_srt_blocks(text):
+    """
+    Extracts the frame fields from a piece of an srt file made of complete blocks.
+
+    DJI writes every block of a file with the same lines in the same order, so the layout of the first
+    block is used to cut the fields out of every block at once, the coordinates included as long as their
+    width does not change. Pieces that do not follow one layout are parsed with the block patterns instead.
+
+    Args:
+        text (bytes): Complete srt blocks, starting at the frame number of the first block.
+
+    Returns:
+        tuple: frame numbers, timestamps and frame times as lists of bytes, and positions (latitude, longitude,
+        altitude) as an array of floats or a list of tuples of bytes.
+    """
+    lines = text.split(b'\n')
+    layout = srt_block_layout(lines)
+
+    if layout is not None:
+        block_size, frame_time_span, timestamp_line, timestamp_span, position_line, position_spans = layout
+        count = len(lines) // block_size
+        rest = lines[count * block_size:]
+        lines = lines[:count * block_size]
+        frame_lines = lines[0::block_size]
+
+        # Every block has to end with a blank line and start with its frame number
+        if not any(rest) and not any(lines[block_size - 1::block_size]) and all(map(bytes.isdigit, frame_lines)):
+            start, end = frame_time_span
+            frame_times = [line[start:end] for line in lines[1::block_size]]
+            start, end = timestamp_span
+            timestamps = [line[start:end] for line in lines[timestamp_line::block_size]]
+
+            # Cut the coordinates at the same distance from the end of every line, from the latitude to the altitude
+            start, end = position_spans[0][0], position_spans[2][1]
+            tails = fixed_width_chars([line[start:end] for line in lines[position_line::block_size]])
+            positions = None
+            if tails is not None:
+                fields = [(field_start - start, field_end - start) for field_start, field_end in position_spans]
+
+                # The text between the numbers, '] [longitude: ' and '] [altitude: ', has to be the same in every block
+                between = np.ones(tails.shape[1], dtype=bool)
+                for field_start, field_end in fields:
+                    between[field_start:field_end] = False
+                if (tails[:, between] == tails[0, between]).all():
+                    positions = [parse_decimals(tails[:, field_start:field_end]) for field_start, field_end in fields]
+
+            if (positions is not None and all(column is not None for column in positions)
+                    and clock_column_valid(frame_times) and clock_column_valid(timestamps)
+                    and len(frame_times[0]) == 12 and len(timestamps[0]) == 16):
+                return frame_lines, timestamps, np.column_stack(positions), frame_times
+
+    # Blocks without a common layout are matched one by one
+    frames = SRT_FRAME_PATTERN.findall(text)
+    frame_times = SRT_FRAME_TIME_PATTERN.findall(text)
+    count = min(len(frames), len(frame_times))
+    frame_numbers = [frame[0] for frame in frames[:count]]
+    timestamps = [frame[1] for frame in frames[:count]]
+    positions = [frame[2:] for frame in frames[:count]]
+    return frame_numbers, timestamps, positions, frame_times[:count]
+
+
+def read_srt_chunks(file_path, chunk_size=SRT_CHUNK_SIZE):
+    """
+    Reads an srt file block by block, yielding the frames of one chunk of the file at a time as typed arrays.
+
+    The file is memory mapped and parsed as bytes in chunks cut at the last complete block, so it is never decoded
+    and only one chunk is copied out of the map at a time. The pages of the map belong to the page cache, which
+    keeps the resident memory of the process flat with the size of the file and shared between the workers.
+
+    Args:
+        file_path (str): The path to the srt file.
+        chunk_size (int): Number of bytes parsed at a time.
+
+    Yields:
+        tuple: Array of every column in SRT_COLUMNS for the frames of the chunk, and the fraction of the file read.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Files written on Windows end their lines with \r\n
+            crlf = mm.find(b'\r\n', 0, min(size, chunk_size)) != -1
+            separator = b'\r\n\r\n' if crlf else b'\n\n'
+
+            # The file is read once from start to end, madvise is not available on Windows
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+
+            start = 0
+            while start < size:
+                # Cut the chunk after the last complete block in it, taking more of the file if no block ends in it
+                end = min(start + chunk_size, size)
+                while end < size:
+                    cut = mm.rfind(separator, start, end)
+                    if cut != -1:
+                        end = cut + len(separator)
+                        break
+                    end = min(end + chunk_size, size)
+
+                text = mm[start:end]
+
+                # Release the pages already parsed so the resident memory does not grow with the file
+                if hasattr(mmap, 'MADV_DONTNEED'):
+                    released = start - start % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+                start = end
+                if crlf:
+                    text = text.replace(b'\r\n', b'\n')
+
+                frame_numbers, timestamps, positions, frame_times = parse_srt_blocks(text.lstrip(b'\n'))
+                if not frame_numbers:
+                    continue
+
+                position = np.asarray(positions, dtype=np.float64)
+                yield {
+                    'frame': np.array(frame_numbers, dtype=np.int64),
+                    'timestamp': clock_to_microseconds(timestamps),
+                    'latitude': position[:, 0],
+                    'longitude': position[:, 1],
+                    'altitude': position[:, 2],
+                    'frame_time': clock_to_microseconds(frame_times),
+                }, end / size
+
+
+def parse_srt(file_path, chunk_size=SRT_CHUNK_SIZE):
+    """
+    Reads an srt file into typed arrays.
+
+    The arrays are allocated from the size of the file and the length of the first chunk and grown only if
+    the estimate was too small.
+
+    Args:
+        file_path (str): The path to the srt file.
+        chunk_size (int): Number of bytes parsed at a time.
+
+    Returns:
+        dict: Array of every column in SRT_COLUMNS, one entry per frame.
+    """
+    columns = None
+    count = 0
+
+    for chunk, read in read_srt_chunks(file_path, chunk_size):
+        new = len(chunk['frame'])
+
+        if columns is None:
+            # Estimate the number of frames from the size of the blocks read so far
+            estimate = max(new, int(new / read * 1.05) + 1)
+            columns = {name: np.empty(estimate, dtype=dtype) for name, dtype in SRT_COLUMNS.items()}
+
+        if count + new > len(columns['frame']):
+            grow = max(2 * len(columns['frame']), count + new)
+            for name in columns:
+                grown = np.empty(grow, dtype=columns[name].dtype)
+                grown[:count] = columns[name][:count]
+                columns[name] = grown
+
+        for name in columns:
+            columns[name][count:count + new] = chunk[name]
+        count += new
+
+    if columns is None:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in SRT_COLUMNS.items()}
+
+    return {name: values[:count] for name, values in columns.items()}
+
+
+def stream_srt(file_path, chunk_size=SRT_CHUNK_SIZE):
+    """
+    Summarises a recording while reading it, without keeping its frames.
+
+    The frames are folded into running aggregates chunk by chunk. The drift is the distance from the mean
+    position, so the file is read twice: first for the mean position and the other aggregates, then for the
+    distances. Only one chunk of frames is held at a time.
+
+    Args:
+        file_path (str): The path to the srt file.
+        chunk_size (int): Number of bytes parsed at a time.
+
+    Returns:
+        tuple: Summary values of the recording as returned by summarise_srt, and None in place of the arrays.
+    """
+    count = 0
+    latitude_sum = 0.0
+    longitude_sum = 0.0
+    summary = None
+
+    for chunk, read in read_srt_chunks(file_path, chunk_size):
+        count += len(chunk['frame'])
+        latitude_sum += chunk['latitude'].sum()
+        longitude_sum += chunk['longitude'].sum()
+
+        if summary is None:
+            summary = {
+                'start_timestamp': chunk['timestamp'][0],
+                'minimum height': chunk['altitude'].min(),
+                'Total frames': chunk['frame'].max(),
+                'Frame time': chunk['frame_time'].max(),
+                'maximum height': chunk['altitude'].max()
+            }
+        summary['end_timestamp'] = chunk['timestamp'][-1]
+        summary['minimum height'] = min(summary['minimum height'], chunk['altitude'].min())
+        summary['Total frames'] = max(summary['Total frames'], chunk['frame'].max())
+        summary['Frame time'] = max(summary['Frame time'], chunk['frame_time'].max())
+        summary['maximum height'] = max(summary['maximum height'], chunk['altitude'].max())
+
+    if summary is None:
+        raise ValueError(f"No frames found in {file_path}")
+
+    # Distance of every frame from the mean position of the recording
+    latitude_mean = latitude_sum / count
+    longitude_mean = longitude_sum / count
+    summary['maximum drift'] = max(geodesic_distance(latitude_mean, longitude_mean, chunk['latitude'], chunk['longitude']).max()
+                                   for chunk, read in read_srt_chunks(file_path, chunk_size))
+
+    return summary, None
+
+
+def scan_srt(file_path, scan_size=SRT_SCAN_SIZE):
+    """
+    Summarises a recording from its first and last frame only, reading the head and the tail of the srt file.
+
+    The times and frame counts are all the session needs for miss clicks, sorties, global start/end and frame
+    drops. Heights and drift need every frame, so they are left as NaN.
+
+    Args:
+        file_path (str): The path to the srt file.
+        scan_size (int): Number of bytes read from each end of the file at first.
+
+    Returns:
+        tuple: Summary values of the recording as returned by summarise_srt, and None in place of the arrays.
+    """
+    size = os.path.getsize(file_path)
+
+    with open(file_path, 'rb') as f:
+        # First complete block of the head
+        read = scan_size
+        while True:
+            f.seek(0)
+            text = f.read(read).replace(b'\r\n', b'\n').lstrip(b'\n')
+            if read < size:
+                text = text[:text.rfind(b'\n\n') + 2]
+            first = parse_srt_blocks(text)
+            if first[0] or read >= size:
+                break
+            read *= 2
+
+        # Last complete block of the tail, skipping the partial block it starts in
+        read = scan_size
+        while True:
+            f.seek(max(size - read, 0))
+            text = f.read().replace(b'\r\n', b'\n')
+            if read < size:
+                text = text[text.find(b'\n\n') + 2:] if b'\n\n' in text else b''
+            last = parse_srt_blocks(text.lstrip(b'\n'))
+            if last[0] or read >= size:
+                break
+            read *= 2
+
+    if not first[0] or not last[0]:
+        raise ValueError(f"No frames found in {file_path}")
+
+    start_timestamp, end_timestamp = clock_to_microseconds([first[1][0], last[1][-1]])
+    summary = {
+        'start_timestamp': start_timestamp,
+        'end_timestamp': end_timestamp,
+        'minimum height': np.nan,
+        'maximum drift': np.nan,
+        'Total frames': int(last[0][-1]),
+        'Frame time': clock_to_microseconds([last[3][-1]])[0],
+        'maximum height': np.nan
+    }
+    return summary, None
+
+
+def geodesic_distance(lat1, lon1, lat2, lon2, iterations=20):
+    """
+    Computes the geodesic distance between coordinates on the WGS-84 ellipsoid for whole arrays at once.
+
+    Uses the inverse formula of Vincenty (1975), which is accurate to within 0.5 mm of the exact geodesic
+    used by geopy for points that are not nearly antipodal. Coordinates broadcast against each other, so a
+    single point can be compared with every frame of a recording.
+
+    Args:
+        lat1, lon1 (float or numpy.ndarray): Latitude and longitude of the first coordinates, in degrees.
+        lat2, lon2 (float or numpy.ndarray): Latitude and longitude of the second coordinates, in degrees.
+        iterations (int): Maximum number of iterations of the longitude on the auxiliary sphere.
+
+    Returns:
+        numpy.ndarray: The geodesic distance between the coordinates, in meters.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2)))
+
+    # Reduced latitudes and difference in longitude
+    u1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+    delta_lon = lon2 - lon1
+    lam = delta_lon
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            # Coincident points have no azimuth, points on the equator no midpoint latitude
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+
+            c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = delta_lon + (1 - c) * WGS84_F * sin_alpha * (sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+
+            if np.all(np.abs(lam - lam_prev) < 1e-12):
+                break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) - b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+
+    return WGS84_B * a * (sigma - delta_sigma)
+
+
+def occupancy_steps(starts, ends):
+    """
+    Counts the recordings running over time with a sweep over their start and end times.
+
+    Every start adds 1 and every end removes 1, so the running sum of the sorted events is the number of recordings
+    running, counting a recording from its start until just before its end.
+
+    Args:
+        starts (numpy.ndarray): Start times of the recordings.
+        ends (numpy.ndarray): End times of the recordings.
+
+    Returns:
+        tuple: Times where the number of recordings changes, and the number running from each time until the next one.
+    """
+    times = np.concatenate([starts, ends])
+    events = np.concatenate([np.ones(len(starts), dtype=np.int64), -np.ones(len(ends), dtype=np.int64)])
+
+    order = np.argsort(times, kind='mergesort')
+    times = times[order]
+    counts = np.cumsum(events[order])
+
+    # Keep the count after the last event of every time
+    last = np.append(times[1:] != times[:-1], True)
+    return times[last], counts[last]
+
+
+def summarise_columns(columns):
+    """
+    Summarises a recording from the arrays of its frames.
+
+    Args:
+        columns (dict): Arrays of every frame, including the drift distance.
+
+    Returns:
+        dict: Summary values of the recording.
+    """
+    return {
+        'start_timestamp': columns['timestamp'][0],
+        'end_timestamp': columns['timestamp'][-1],
+        'minimum height': columns['altitude'].min(),
+        'maximum drift': columns['distance'].max(),
+        'Total frames': columns['frame'].max(),
+        'Frame time': columns['frame_time'].max(),
+        'maximum height': columns['altitude'].max()
+    }
+
+
+def summarise_srt(file_path):
+    """
+    Parses an srt file and summarises the recording.
+
+    Runs in the worker processes of dataframecreation, so only arrays and plain values are returned and the
+    thresholds are applied by the caller.
+
+    Args:
+        file_path (str): The path to the srt file.
+
+    Returns:
+        tuple: Summary values of the recording and the arrays of every frame, including the drift distance.
+    """
+    columns = parse_srt(file_path)
+
+    # Distance of every frame from the mean position of the recording
+    columns['distance'] = geodesic_distance(columns['latitude'].mean(), columns['longitude'].mean(), columns['latitude'], columns['longitude'])
+
+    return summarise_columns(columns), columns
+
+
+def srt_signature(file_path):
+    """
+    Size and modification time of an srt file, which change whenever the file is written.
+    """
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def peak_rss():
+    """
+    Peak resident memory of the process so far, in megabytes, or None where it cannot be read.
+    """
+    if resource is None:
+        return None
+
+    # Linux reports kilobytes, macOS bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def profile_srt(file_path, summarise=None):
+    """
+    Runs summarise_srt, or the scan or stream parser, on a file and measures it, in the worker process parsing the file.
+
+    Args:
+        file_path (str): The path to the srt file.
+        summarise (function): Parser of the file, summarise_srt, scan_srt or stream_srt (default is summarise_srt).
+
+    Returns:
+        tuple: The result of the parser and the measurements of the file.
+    """
+    summarise = summarise or summarise_srt
+    begin_wall, begin_cpu = perf_counter(), process_time()
+    summary, columns = summarise(file_path)
+
+    stats = {
+        'file': file_path,
+        'parser': summarise.__name__,
+        'bytes': os.path.getsize(file_path),
+        # The scan and stream parsers keep no frames, the frame count of the file is reported instead
+        'frames': int(summary['Total frames']) if columns is None else len(columns['frame']),
+        'wall seconds': perf_counter() - begin_wall,
+        'cpu seconds': process_time() - begin_cpu,
+        'peak rss MB': peak_rss(),
+        'pid': os.getpid(),
+    }
+    return (summary, columns), stats
+
+
+class StageProfiler:
+    """
+    Measures every step of the analysis of a session: wall time, CPU time of the process and of its worker
+    processes, peak resident memory and the rows it ends with, and optionally the memory allocated by Python.
+    """
+    def __init__(self, cprofile=False, memory=False):
+        """
+        Args:
+            cprofile : Also run every step under cProfile, to dump the statistics of the slowest one.
+                       The times then include the overhead of cProfile.
+            memory : Also trace the memory allocated by Python in every step with tracemalloc.
+                     Tracing every allocation slows the steps down several times, so the times then include its overhead.
+        """
+        self.cprofile = cprofile
+        self.memory = memory
+        self.stages = []
+        self.files = []
+        self.profiles = {}
+
+    def run(self, name, method, *args):
+        """
+        Runs one step and measures it.
+
+        Args:
+            name : Name of the step in the report
+            method : Method running the step
+            args : Arguments of the method
+
+        Return:
+            result : Whatever the method returns
+        """
+        started = self.memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if self.memory:
+            tracemalloc.reset_peak()
+            begin_traced = tracemalloc.get_traced_memory()[0]
+
+        # CPU time of the worker processes is added once they have finished
+        begin_times = os.times()
+        begin_wall = perf_counter()
+
+        profile = cProfile.Profile() if self.cprofile else None
+        if profile is not None:
+            profile.enable()
+        try:
+            result = method(*args)
+        finally:
+            if profile is not None:
+                profile.disable()
+
+            wall = perf_counter() - begin_wall
+            end_times = os.times()
+            if self.memory:
+                traced, traced_peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+
+        stage = {
+            'stage': name,
+            'wall seconds': wall,
+            'cpu seconds': (end_times.user - begin_times.user) + (end_times.system - begin_times.system),
+            'worker cpu seconds': (end_times.children_user - begin_times.children_user) + (end_times.children_system - begin_times.children_system),
+            'peak rss MB': peak_rss(),
+        }
+        if self.memory:
+            stage['traced MB'] = (traced - begin_traced) / (1 << 20)
+            stage['traced peak MB'] = (traced_peak - begin_traced) / (1 << 20)
+        self.stages.append(stage)
+        if profile is not None:
+            self.profiles[name] = profile
+
+        return result
+
+    def rows(self, data_processor):
+        """
+        Records the rows of the session and the frames of its recordings after the last step.
+        """
+        df_day = data_processor.df_day
+        self.stages[-1]['rows'] = 0 if df_day is None else len(df_day)
+        self.stages[-1]['frames'] = 0 if data_processor.df_frames is None else len(data_processor.df_frames)
+
+    def save(self, file_path, session_location):
+        """
+        Saves the measurements as a JSON report.
+        """
+        # Say when the times are inflated by the tracing
+        overhead = [tool for tool, used in (('tracemalloc', self.memory), ('cProfile', self.cprofile)) if used]
+        report = {
+            'session': session_location,
+            'times include overhead of': overhead,
+            'total wall seconds': sum(stage['wall seconds'] for stage in self.stages),
+            'stages': self.stages,
+            'files': self.files,
+        }
+        with open(file_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def dump_slowest(self, file_path):
+        """
+        Dumps the cProfile statistics of the slowest step, readable with pstats or snakeviz.
+
+        Return:
+            name : Name of the slowest step
+        """
+        slowest = max(self.stages, key=lambda stage: stage['wall seconds'])['stage']
+        self.profiles[slowest].dump_stats(file_path)
+        return slowest
+
+
+class SrtCache:
+    """
+    On-disk cache of parsed srt files.
+
+    Every recording is stored as an .npz file named after the path, size and modification time of the srt
+    file and the parser version, so a changed file or parser never hits an old entry. When the cache grows
+    past its size limit the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir, max_size=SRT_CACHE_SIZE):
+        """
+        Args:
+            cache_dir (str): Folder holding the cache entries, created if missing.
+            max_size (float): Limit of the total size of the entries, in megabytes.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry(self, file_path):
+        """
+        Returns the path of the cache entry of an srt file in its current state.
+        """
+        stat = os.stat(file_path)
+        key = f'{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{SRT_PARSER_VERSION}'
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + '.npz')
+
+    def load(self, file_path):
+        """
+        Loads the parsed srt file from the cache.
+
+        Returns:
+            tuple: Summary values and arrays of the recording as returned by summarise_srt, or None if the
+            file is not in the cache.
+        """
+        entry = self.entry(file_path)
+
+        try:
+            with np.load(entry) as data:
+                columns = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+
+        # Mark the entry as recently used, unless another process evicted it in the meantime
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return summarise_columns(columns), columns
+
+    def store(self, file_path, columns):
+        """
+        Writes the arrays of a parsed srt file to the cache.
+        """
+        entry = self.entry(file_path)
+
+        # Write to a temporary file first so an interrupted run never leaves a broken entry
+        temp_path = entry + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(temp_path, entry)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its size limit. The sessions of a season
+        share the cache from their own processes, so an entry may be gone by the time it is listed or removed.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def find_sessions(root):
+    """
+    Finds every session under a folder, a session being a folder with position and drone folders holding srt files,
+    e.g. <date>/<site>/<session>/P1D1/DJI_0123.SRT
+
+    Args:
+        root : Folder of the season
+
+    Return:
+        sessions : Sorted list of the session folders
+    """
+    srt_files = glob.glob(os.path.join(root, '**', '*.SRT'), recursive=True)
+    return sorted({os.path.dirname(os.path.dirname(file)) for file in srt_files})
+
+
+def analyse_session(session_location, args):
+    """
+    Analyses one session of a season, catching any error so that one broken session does not stop the others.
+
+    Args:
+        session_location : Folder of the session
+        args : Parsed command line arguments
+
+    Return:
+        session_location : Folder of the session
+        df_csv : data frame of the session as saved in the csv file, None if the analysis failed
+        error : Traceback of the error, None if the analysis worked
+    """
+    # Sessions run in their own processes, so the srt files of a session are parsed in one process and no plot is shown
+    args = argparse.Namespace(**{**vars(args), 'workers': 1, 'showplot': False})
+    plt.switch_backend('Agg')
+
+    data_processor = DataProcessor()
+    data_processor.session_location = session_location
+    try:
+        return session_location, data_processor.analyse(args), None
+    except Exception:
+        return session_location, None, traceback.format_exc()
+
+
+def session_output(file_path, session):
+    """
+    Adds the name of a session to an output file shared by every session of a season, e.g. profile.json becomes
+    profile_20230312_SE_Lek1.json, so the sessions do not overwrite each other.
+
+    Args:
+        file_path : Path of the output file given on the command line
+        session : Folder of the session relative to the season
+
+    Return:
+        file_path : Path of the output file of the session
+    """
+    name, extension = os.path.splitext(file_path)
+    return f"{name}_{session.replace(os.sep, '_').replace('/', '_')}{extension}"
+
+
+def analyse_season(root, args):
+    """
+    Analyses every session under the folder of a season in a pool of --workers processes and saves a csv combining
+    the sessions, next to the csv, text and graph saved in every session.
+
+    Args:
+        root : Folder of the season
+        args : Parsed command line arguments
+
+    Return:
+        df_season : data frame of every session that was analysed
+        errors : Dictionary of the session folders that failed to their traceback
+    """
+    sessions = find_sessions(root)
+    print(f"Found {len(sessions)} sessions under {root}")
+
+    results = {}
+    errors = {}
+    # Every session writes its own profile and cProfile statistics
+    session_args = {}
+    for session in sessions:
+        relative = os.path.relpath(session, root)
+        outputs = {name: session_output(getattr(args, name), relative) for name in ('profile', 'cprofile') if getattr(args, name, None)}
+        session_args[session] = argparse.Namespace(**{**vars(args), **outputs})
+
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+        futures = {pool.submit(analyse_session, session, session_args[session]): session for session in sessions}
+        for future in as_completed(futures):
+            session = futures[future]
+            try:
+                session, df_csv, error = future.result()
+            except Exception:
+                # The worker process itself died, e.g. ran out of memory
+                df_csv, error = None, traceback.format_exc()
+
+            if error is None:
+                results[session] = df_csv
+                print(f"Analysed {session}")
+            else:
+                errors[session] = error
+                print(f"Failed {session}")
+
+    # Combine the sessions in the order they were found, each row marked with the folder of its session
+    df_list = []
+    for session in sessions:
+        if session in results:
+            df_csv = results[session].copy()
+            df_csv.insert(0, 'Session', os.path.relpath(session, root).replace('\\', '/'))
+            df_list.append(df_csv)
+    df_season = pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
+
+    name = os.path.basename(os.path.normpath(os.path.abspath(root)))
+    df_season.to_csv(os.path.join(root, f'{name}_season.csv'), index=False)
+
+    # Keep the tracebacks of the failed sessions
+    if errors:
+        with open(os.path.join(root, f'{name}_season_errors.txt'), 'w') as f:
+            f.write("Sessions that failed\n")
+            for session in sessions:
+                if session in errors:
+                    f.write(f"\n{session}\n{errors[session]}")
+
+    print(f"Analysed {len(results)} of {len(sessions)} sessions, {len(errors)} failed")
+    return df_season, errors
+
 
 class DataProcessor:
     def __init__(self):
         self.df_day = None
         self.df_plot = None
-        self.df_dict = None
+        self.df_frames = None
         self.session_location = None
         self.df_p = None
+        self.parsed = {}
 
     def sessionlocation(self):
         """
@@ -42,122 +1075,195 @@ class DataProcessor:
         
         
     def sortedfolders(self):
+        """
+        Lists the folders of the session and, in one scan of every folder, its srt and mp4 files.
+
+        Return:
+            folders : Sorted paths in the session
+            srt_paths : Dictionary of every folder to its sorted srt files
+            video_paths : Dictionary of every folder to its sorted mp4 files
+        """
         self.folders = sorted(glob.glob(self.session_location + '/*'))
+        self.srt_paths = {}
+        self.video_paths = {}
+
+        for folder in self.folders:
+            if os.path.isdir(folder):
+                with os.scandir(folder) as entries:
+                    names = sorted(entry.name for entry in entries if entry.is_file())
+                self.srt_paths[folder] = [os.path.join(folder, name) for name in names if name.endswith('.SRT')]
+                self.video_paths[folder] = [os.path.join(folder, name) for name in names if name.lower().endswith('.mp4')]
 
-    def dataframecreation(self, drift_thresh,  height_thresh):
+    def dataframecreation(self, drift_thresh,  height_thresh, workers=1, cache=None, profile=False, scan=False, stream=False):
         """
         Takes data from the srt files and converts them to a data frame
 
         Args:
             folders: Location of the files
+            workers: Number of processes parsing the srt files at the same time
+            cache: SrtCache holding files parsed in earlier runs, or None to parse every file
+            parsed: Files parsed in earlier calls on this DataProcessor, with their size and modification time
+            profile: Measure the parsing of every file into self.file_profile
+            scan: Only read the first and last frame of the files, leaving heights and drift out. The frames of the
+            files holding the global start and end are read later by frame_at.
+            stream: Summarise the files while reading them without keeping their frames. The frames of the files
+            holding the global start and end are read later by frame_at.
 
         Return:
             df_day: data frame created for the whole session
             df_plot: data frame to draw the graph at the end
-            df_dict: dictionary that contains data frame of every single srt file
+            df_frames: data frame of every frame of the session, the recordings one after the other
+            frame_offsets: row of the frame table where every recording starts, and the end of the table
         """
-        
-        # Create empty lists to store dataframes and results 
-        df_list = []
-        dist_max = []
-        drift_status = []
-        height_status = []
-        df_dict = {}
-        
-
-        def extract_data_from_srt(file_path):
-            """
-            Extracts data from a SubRip subtitle file.
-
-            Args:
-                file_path (str): The path to the subtitle file.
 
-            Returns:
-                pandas.DataFrame: A DataFrame containing the extracted data.
-            """
-            with open(file_path, 'r') as f:
-                content = f.read()
-            # Use regular expressions to extract the frame number, timestamp, latitude, longitude, and altitude from each frame
-            frames = re.findall(r'(\d+)\n.*?(\d{2}:\d{2}:\d{2},\d{3},\d{3}).*?\[latitude:\s*([-+]?\d+\.\d+)\]\s*\[longitude:\s*([-+]?\d+\.\d+)\]\s*\[altitude:\s*([-+]?\d+\.\d+)\]', content, re.DOTALL)
-            frame_times = re.findall(r'\d{2}:\d{2}:\d{2},\d{3} --> (\d{2}:\d{2}:\d{2},\d{3})', content)
-
-            # Convert the extracted data into a list of dictionaries, where each dictionary represents one frame
-            results = [{'frame': int(frame), 'timestamp': str(timestamp), 'latitude': float(latitude), 'longitude': float(longitude), 'altitude': float(altitude), 'frame_time': frame_time} for (frame, timestamp, latitude, longitude, altitude), frame_time in zip(frames, frame_times)]
-
-            # Convert the list of dictionaries into a pandas DataFrame and return it
-            return pd.DataFrame(results)
-
-        def geodist(coord1, coord2_lat, coord2_long):
-            """
-            Computes the geodesic distance between two geographic coordinates.
-
-            Args:
-                coord1 (tuple): A tuple representing the first coordinate, in the format (latitude, longitude).
-                coord2_lat (float): The latitude of the second coordinate.
-                coord2_long (float): The longitude of the second coordinate.
-
-            Returns:
-                float: The geodesic distance between the two coordinates, in meters.
-            """
-            return distance.distance(coord1, (coord2_lat, coord2_long)).m
-
-        for folder in self.folders:
-            files = sorted(glob.glob(folder + '/*.SRT'))
-
-            for file in files:
-                df_rec = extract_data_from_srt(file)
-
-                # Working on altitude to find relay
-                df_rec['normal_altitude'] = 80.0
-                df_rec['height_difference'] = df_rec['altitude'] - df_rec['normal_altitude']
-
-                if df_rec['height_difference'].max() > height_thresh:
-                    height_status.append(1)
-                else:
-                    height_status.append(0)
-
-                # Working on drift
-                coord1 = (df_rec['latitude'].mean(), df_rec['longitude'].mean())
-                df_rec['distance'] = df_rec.apply(lambda row: geodist(coord1, row.latitude, row.longitude), axis=1)
-
-                if df_rec['distance'].max() > drift_thresh:
-                    drift_status.append(1)
-                else:
-                    drift_status.append(0)
-
-                start_ts = df_rec['timestamp'].iloc[0]
-                end_ts = df_rec['timestamp'].iloc[-1]
-
-                df_list.append({
-                    'folder': folder[-4:],
-                    'Video_ID': file[-12:-4],
-                    'start_timestamp': start_ts,
-                    'end_timestamp': end_ts,
-                    'File path': folder,
-                    'minimum height': df_rec['altitude'].min(),
-                    'maximum drift': df_rec['distance'].max(),
-                    'Total frames': df_rec['frame'].max(),
-                    'Frame time': df_rec['frame_time'].max(),
-                    'maximum height': df_rec['altitude'].max()
-                })
-
-                df_dict[folder[-4:] + '_' + file[-12:-4]] = df_rec.copy()  # Creates a dictionary consisting of data frame of every srt file
+        # Every srt file of the session in the order of the folders
+        recordings = [(folder, file) for folder in self.folders for file in self.srt_paths.get(folder, [])]
+        file_paths = [file for folder, file in recordings]
+
+        # Reuse the files parsed in earlier calls or runs that have not changed since, only the thresholds are applied again
+        signatures = [srt_signature(file) for file in file_paths]
+        results = []
+        for file, signature in zip(file_paths, signatures):
+            if file in self.parsed and self.parsed[file][0] == signature and (scan or stream or self.parsed[file][1][1] is not None):
+                result = self.parsed[file][1]
+            elif cache is not None:
+                result = cache.load(file)
+            else:
+                result = None
+
+            # A streamed session keeps no frames, only the summary of a file parsed before is used
+            if stream and result is not None:
+                result = (result[0], None)
+            # A scanned session leaves heights and drift out, also for a file parsed before, so the rows do not depend on the cache
+            if scan and result is not None:
+                result = ({**result[0], 'minimum height': np.nan, 'maximum drift': np.nan, 'maximum height': np.nan}, None)
+            results.append(result)
+        missing = [file for file, result in zip(file_paths, results) if result is None]
+
+        # Parse and summarise the other files, in a process pool if more than one worker is asked for
+        if scan:
+            summarise = scan_srt
+        elif stream:
+            summarise = stream_srt
+        else:
+            summarise = summarise_srt
+        if profile:
+            summarise = partial(profile_srt, summarise=summarise)
+        if workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(summarise, missing))
+        else:
+            parsed = [summarise(file) for file in missing]
+
+        if profile:
+            self.file_profile = [stats for result, stats in parsed]
+            parsed = [result for result, stats in parsed]
+
+        parsed = iter(parsed)
+        for i, file in enumerate(file_paths):
+            if results[i] is None:
+                results[i] = next(parsed)
+                if cache is not None and results[i][1] is not None:
+                    cache.store(file, results[i][1])
+
+        if cache is not None:
+            cache.evict()
+
+        # Keep the parsed files for the next call, forgetting the files that are gone
+        self.parsed = {file: (signature, result) for file, signature, result in zip(file_paths, signatures, results)}
+
+        # map returns the results in the order of the files, so df_day and df_frames do not depend on the workers
+        names = [folder[-4:] + '_' + file[-12:-4] for folder, file in recordings]
+        srt_files = dict(zip(names, file_paths))
+
+        # Copy the frames of every recording into one table, the scanned and streamed files have no frames
+        lengths = np.array([0 if columns is None else len(columns['frame']) for summary, columns in results], dtype=np.int64)
+        frame_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        table = {}
+        for column, dtype in FRAME_TABLE_COLUMNS.items():
+            table[column] = np.empty(frame_offsets[-1], dtype=dtype)
+            for (summary, columns), start, stop in zip(results, frame_offsets[:-1], frame_offsets[1:]):
+                if columns is not None:
+                    table[column][start:stop] = columns[column]
+
+        # Recording, position and drone of every frame as categories of the recordings
+        positions = pd.Categorical([name[:2] for name in names])
+        drones = pd.Categorical([name[2:4] for name in names])
+        df_frames = pd.DataFrame({
+            'recording': pd.Categorical.from_codes(np.repeat(np.arange(len(names)), lengths), categories=names),
+            'position': pd.Categorical.from_codes(np.repeat(positions.codes, lengths), categories=positions.categories),
+            'drone': pd.Categorical.from_codes(np.repeat(drones.codes, lengths), categories=drones.categories),
+            **table
+        }, copy=False)
+        del table
+
+        # Statistics of every recording in one pass over the table
+        summaries = df_frames.groupby('recording', observed=True, sort=False).agg(**{
+            'start_timestamp': ('timestamp', 'first'),
+            'end_timestamp': ('timestamp', 'last'),
+            'minimum height': ('altitude', 'min'),
+            'maximum drift': ('distance', 'max'),
+            'Total frames': ('frame', 'max'),
+            'Frame time': ('frame_time', 'max'),
+            'maximum height': ('altitude', 'max'),
+        })
+        summaries.index = summaries.index.astype(str)
+        summaries = summaries.reindex(names)
+
+        # Scanned and streamed files bring their own summary
+        for name, (summary, columns) in zip(names, results):
+            if columns is None:
+                summaries.loc[name] = pd.Series(summary)
+        summaries = summaries.astype({'start_timestamp': np.int64, 'end_timestamp': np.int64, 'Total frames': np.int64, 'Frame time': np.int64})
+
+        # Keep views of the table for the next call in place of the parsed arrays
+        for name, file, start, stop in zip(names, file_paths, frame_offsets[:-1], frame_offsets[1:]):
+            signature, (summary, columns) = self.parsed[file]
+            if columns is not None:
+                self.parsed[file] = (signature, (summary, {column: df_frames[column].values[start:stop] for column in FRAME_TABLE_COLUMNS}))
 
         # Creates the data frame by extracting necessary information from the srt files
-        df_day = pd.DataFrame(df_list)
-        df_day['drift_status'] = drift_status
-        df_day['Relay video'] = height_status
-
-        def frame_time_to_seconds(time_str):
-            time_obj = datetime.strptime(time_str, '%H:%M:%S,%f')
-            return time_obj.hour * 3600 + time_obj.minute * 60 + time_obj.second + time_obj.microsecond / 1000000
-
-        df_day['Frame time'] = df_day['Frame time'].apply(frame_time_to_seconds)
+        df_day = pd.DataFrame({
+            'folder': [folder[-4:] for folder, file in recordings],
+            'Video_ID': [file[-12:-4] for folder, file in recordings],
+            'start_timestamp': summaries['start_timestamp'].values,
+            'end_timestamp': summaries['end_timestamp'].values,
+            'File path': [folder for folder, file in recordings],
+            'minimum height': summaries['minimum height'].values,
+            'maximum drift': summaries['maximum drift'].values,
+            'Total frames': summaries['Total frames'].values,
+            'Frame time': summaries['Frame time'].values,
+            'maximum height': summaries['maximum height'].values
+        }, columns=['folder', 'Video_ID', 'start_timestamp', 'end_timestamp', 'File path', 'minimum height', 'maximum drift', 'Total frames', 'Frame time', 'maximum height'])
+
+        # Working on drift, left empty when the drift was not read (--scan)
+        df_day['drift_status'] = (df_day['maximum drift'] > drift_thresh).astype(int).where(df_day['maximum drift'].notna())
+
+        # Working on altitude to find relay, the highest frame above the normal altitude of 80m, left empty when the heights were not read
+        df_day['Relay video'] = (df_day['maximum height'] - 80.0 > height_thresh).astype(int).where(df_day['maximum height'].notna())
+
+        df_day['Frame time'] = frame_time_to_seconds(df_day['Frame time'])
         df_plot = df_day.copy()
 
         self.df_day = df_day
         self.df_plot = df_plot
-        self.df_dict = df_dict
+        self.df_frames = df_frames
+        self.frame_offsets = frame_offsets
+        self.srt_files = srt_files
+        self.scanned_frames = {}
+
+    def recording(self, name):
+        """
+        Frames of one recording, a slice of the frame table sharing its memory.
+
+        Args:
+            name : Name of the recording, position and drone followed by the Video_ID, e.g. P1D1_DJI_0123
+
+        Return:
+            df_rec : data frame of the frames of the recording
+        """
+        index = self.df_frames['recording'].cat.categories.get_loc(name)
+        return self.df_frames.iloc[self.frame_offsets[index]:self.frame_offsets[index + 1]]
 
 
     def rearrangecolumns(self):
@@ -207,21 +1313,13 @@ class DataProcessor:
         dfs = {}
 
         for position in positions:
-            self.df_p = self.df_day[self.df_day['position'] == position]
-
-            # Remove the comma before microseconds
-            self.df_p['start_timestamp'] = self.df_p['start_timestamp'].str.replace(',', '')
-            self.df_p['end_timestamp'] = self.df_p['end_timestamp'].str.replace(',', '')
-
-            # Convert the timestamp columns to datetime type
-            self.df_p['start_timestamp'] = pd.to_datetime(self.df_p['start_timestamp'], format='%H:%M:%S%f')
-            self.df_p['end_timestamp'] = pd.to_datetime(self.df_p['end_timestamp'], format='%H:%M:%S%f')
+            self.df_p = self.df_day[self.df_day['position'] == position].copy()
 
             # Shift the values in the "end_timestamp" column by one row
             self.df_p['previous_end_timestamp'] = self.df_p['end_timestamp'].shift(1)
 
-            # Calculate the time difference and store the absolute value in the "end_start_diff" column
-            self.df_p['end_start_diff'] = (self.df_p['previous_end_timestamp'] - self.df_p['start_timestamp']).dt.total_seconds().abs()
+            # Calculate the time difference in seconds and store the absolute value in the "end_start_diff" column
+            self.df_p['end_start_diff'] = ((self.df_p['previous_end_timestamp'] - self.df_p['start_timestamp']) / 1000000).abs()
 
             # Remove the unnecessary column
             self.df_p = self.df_p.drop('previous_end_timestamp', axis=1)
@@ -241,10 +1339,6 @@ class DataProcessor:
             # Merge the data from error and Miss click
             self.df_day.loc[self.df_p.index, 'Miss click'] = self.df_p['error'].values
 
-            # Remove the dates from the timestamp columns
-            self.df_p['start_timestamp'] = self.df_p['start_timestamp'].dt.time
-            self.df_p['end_timestamp'] = self.df_p['end_timestamp'].dt.time
-
             # Store the DataFrame in the dictionary
             dfs[position] = self.df_p.copy()
 
@@ -315,6 +1409,10 @@ class DataProcessor:
         Column created for sortie id by considering the drone number and difference between the start and end time of consecutive
         drones
 
+        The recordings of every position and drone are sorted once by start time. A gap of more than 10 minutes after the
+        previous recording of the same drone starts a new sortie, so the sortie of a recording is twice the number of gaps
+        before it, plus 1 for the first drones and 2 for the second drones.
+
         Args:
             df_day : dataframe of the session
             first_drone_P1, first_drone_P2, first_drone_P3 : First drone that flew at each position
@@ -324,123 +1422,30 @@ class DataProcessor:
             df_day : Updated dataframe of the session 
 
         """
-        # For the first set of drones
         positions = ['P1', 'P2', 'P3']
-        drones = [self.first_drone_P1, self.first_drone_P2, self.first_drone_P3]
+        first_drones = [self.first_drone_P1, self.first_drone_P2, self.first_drone_P3]
+        second_drones = [self.second_drone_P1, self.second_drone_P2, self.second_drone_P3]
 
-        dfs = {}
+        # Flight numbers of the first drones start at 1 and of the second drones at 2
+        first_flight = np.where(self.df_day['drone'].isin(second_drones), 2, np.where(self.df_day['drone'].isin(first_drones), 1, 0))
+        df_p = self.df_day[['position', 'drone', 'start_timestamp', 'end_timestamp']].assign(first_flight=first_flight)
+        df_p = df_p[df_p['position'].isin(positions) & (df_p['first_flight'] > 0)]
 
-        for position in positions:
-            for drone in drones:
-                df_p = self.df_day[(self.df_day['position'] == position) & (self.df_day['drone'] == drone)]
+        # Rearrange the recordings of each position and drone in ascending order of the start_timestamp column
+        df_p = df_p.sort_values(by=['position', 'drone', 'start_timestamp'], kind='mergesort')
+        drone_groups = [df_p['position'], df_p['drone']]
 
-                if not df_p.empty:  # Check if the DataFrame is not empty
-                    # Rearrange df_p in ascending order of the data in the start_timestamp column
-                    df_p = df_p.sort_values(by='start_timestamp', ascending=True)
+        # Calculate the time difference in seconds between the start and the end of the previous recording of the same drone
+        previous_end_timestamp = df_p.groupby(drone_groups)['end_timestamp'].shift(1)
+        end_start_diff = ((df_p['start_timestamp'] - previous_end_timestamp) / 1000000).abs()
 
-                    # Remove the comma before microseconds
-                    df_p['start_timestamp'] = df_p['start_timestamp'].str.replace(',', '')
-                    df_p['end_timestamp'] = df_p['end_timestamp'].str.replace(',', '')
+        # FINDING THE SORTIE NUMBER
+        # Count the gaps longer than 10 minutes up to each recording, every gap moves the drone two sorties on
+        new_sortie = (end_start_diff > 600).astype(int)
+        sortie = 2 * new_sortie.groupby(drone_groups).cumsum() + df_p['first_flight']
 
-                    # Convert the timestamp columns to datetime type
-                    df_p['start_timestamp'] = pd.to_datetime(df_p['start_timestamp'], format='%H:%M:%S%f')
-                    df_p['end_timestamp'] = pd.to_datetime(df_p['end_timestamp'], format='%H:%M:%S%f')
-
-                    # Shift the values in the "start_timestamp" column by one row
-                    df_p['previous_end_timestamp'] = df_p['end_timestamp'].shift(1)
-
-                    # Calculate the time difference and store the absolute value in the "end_start_diff" column
-                    df_p['end_start_diff'] = (df_p['start_timestamp'] - df_p['previous_end_timestamp']).dt.total_seconds().abs()
-
-                    # Remove the unnecessary column
-                    df_p = df_p.drop('previous_end_timestamp', axis=1)
-
-                    # To remove NAN of the last row
-                    df_p['end_start_diff'] = df_p['end_start_diff'].fillna(0)
-
-                    # FINDING THE SORTIE NUMBER
-                    # Initialize the sortie column with 1
-                    df_p['sortie'] = 0
-
-                    # Set the sortie values based on the condition
-                    sortie_count = 0
-                    for index, row in df_p.iterrows():
-                        if pd.notnull(row['end_start_diff']) and row['end_start_diff'] > 600:
-                            sortie_count += 2
-                        df_p.at[index, 'sortie'] = sortie_count + 1
-
-
-                    # Convert the "sortie" column to integer type
-                    df_p['sortie'] = df_p['sortie'].astype(int)
-
-                    # Merge the data from "sortie" column of df_p to "flight number" column of df_day
-                    self.df_day.loc[df_p.index, 'flight number'] = df_p['sortie'].values
-
-                    # Remove the dates from the timestamp columns
-                    df_p['start_timestamp'] = df_p['start_timestamp'].dt.time
-                    df_p['end_timestamp'] = df_p['end_timestamp'].dt.time
-
-                    # Store the DataFrame in the dictionary
-                    dfs[(position, drone)] = df_p.copy()
-
-        #For the second set of drones
-        positions = ['P1', 'P2', 'P3']
-        drones = [self.second_drone_P1, self.second_drone_P2, self.second_drone_P3]
-
-        dfs = {}
-
-        for position in positions:
-            for drone in drones:
-                df_p = self.df_day[(self.df_day['position'] == position) & (self.df_day['drone'] == drone)]
-
-                if not df_p.empty:  # Check if the DataFrame is not empty
-                    # Rearrange df_p in ascending order of the data in the start_timestamp column
-                    df_p = df_p.sort_values(by='start_timestamp', ascending=True)
-
-                    # Remove the comma before microseconds
-                    df_p['start_timestamp'] = df_p['start_timestamp'].str.replace(',', '')
-                    df_p['end_timestamp'] = df_p['end_timestamp'].str.replace(',', '')
-
-                    # Convert the timestamp columns to datetime type
-                    df_p['start_timestamp'] = pd.to_datetime(df_p['start_timestamp'], format='%H:%M:%S%f')
-                    df_p['end_timestamp'] = pd.to_datetime(df_p['end_timestamp'], format='%H:%M:%S%f')
-
-                    # Shift the values in the "start_timestamp" column by one row
-                    df_p['previous_end_timestamp'] = df_p['end_timestamp'].shift(1)
-
-                    # Calculate the time difference and store the absolute value in the "end_start_diff" column
-                    df_p['end_start_diff'] = (df_p['start_timestamp'] - df_p['previous_end_timestamp']).dt.total_seconds().abs()
-
-                    # Remove the unnecessary column
-                    df_p = df_p.drop('previous_end_timestamp', axis=1)
-
-                    # To remove NAN of the last row
-                    df_p['end_start_diff'] = df_p['end_start_diff'].fillna(0)
-
-                    # FINDING THE SORTIE NUMBER
-                    # Initialize the sortie column with 1
-                    df_p['sortie'] = 0
-
-                    # Set the sortie values based on the condition
-                    sortie_count = 0
-                    for index, row in df_p.iterrows():
-                        if pd.notnull(row['end_start_diff']) and row['end_start_diff'] > 600:
-                            sortie_count += 2
-                        df_p.at[index, 'sortie'] = sortie_count + 2
-
-
-                    # Convert the "sortie" column to integer type
-                    df_p['sortie'] = df_p['sortie'].astype(int)
-
-                    # Merge the data from "sortie" column of df_p to "flight number" column of df_day
-                    self.df_day.loc[df_p.index, 'flight number'] = df_p['sortie'].values
-
-                    # Remove the dates from the timestamp columns
-                    df_p['start_timestamp'] = df_p['start_timestamp'].dt.time
-                    df_p['end_timestamp'] = df_p['end_timestamp'].dt.time
-
-                    # Store the DataFrame in the dictionary
-                    dfs[(position, drone)] = df_p.copy()                
+        # Merge the sortie numbers to "flight number" column of df_day
+        self.df_day.loc[df_p.index, 'flight number'] = sortie.values
        
     
     def startendtime(self):
@@ -457,8 +1462,8 @@ class DataProcessor:
 
         Return:
             df_day : Updated dataframe of the session
-            common_start_time: Global start time of the session
-            common_end_time  : Global end time of the session
+            common_start_time: Global start time of the session, in microseconds since midnight
+            common_end_time  : Global end time of the session, in microseconds since midnight
 
 
         """
@@ -489,54 +1494,14 @@ class DataProcessor:
         common_end_time = min(end_times)
         self.common_end_time = common_end_time
 
-        # Assign values to the first row of the new columns
+        # Assign values to the first row of the new columns and 0 to rest of the rows, they are formatted when the csv file is saved
+        self.df_day['Global start time'] = 0
+        self.df_day['Global end time'] = 0
         self.df_day.loc[0, 'Global start time'] = common_start_time
         self.df_day.loc[0, 'Global end time'] = common_end_time
 
-        #Assign 0 to rest of the rows
-        self.df_day['Global start time'].iloc[1:] = pd.to_datetime(0)
-        self.df_day['Global end time'].iloc[1:] = pd.to_datetime(0)
-
-        # Convert 'Common start time' and 'Common end time' columns to datetime
-        self.df_day['Global start time'] = pd.to_datetime(self.df_day['Global start time'].astype(str))
-        self.df_day['Global end time'] = pd.to_datetime(self.df_day['Global end time'].astype(str))
-        self.df_day.loc[1:, 'Global start time'] = pd.to_datetime(0)
-        self.df_day.loc[1:, 'Global end time'] = pd.to_datetime(0)
-
-        # Remove date part from 'Common start time' column and 'Common end time' column where value is not 0
-        self.df_day['Global start time'] = self.df_day['Global start time'].apply(lambda x: x.time() if type(x) == pd.Timestamp else x)
-        self.df_day['Global end time'] = self.df_day['Global end time'].apply(lambda x: x.time() if type(x) == pd.Timestamp else x)
-
-        #TO MAKE SURE CSV FILE IS NOT ROUNDED UP FOR COMMON START AND END TIME
-
-        # Function to format time strings to "hours:minutes:seconds,microseconds" format
-        def format_common_time(time_obj):
-            time_str = str(time_obj)  # Convert datetime.time object to string
-            hours, minutes, seconds = time_str.split(":")
-
-            # Split the seconds part into seconds and microseconds
-            seconds_part = seconds.split(".")
-            seconds = seconds_part[0]
-            microseconds = seconds_part[1] if len(seconds_part) > 1 else '000000'
-            microseconds = microseconds.ljust(6, "0")  # Pad zeros if needed
-
-            formatted_time = f"{hours}:{minutes}:{seconds},{microseconds}"
-            return formatted_time
-
-        # Format the time values in the columns
-        self.df_day['Global start time'] = self.df_day['Global start time'].apply(format_common_time)
-        self.df_day['Global end time'] = self.df_day['Global end time'].apply(format_common_time)
-
-
-        # Set all rows from index 1 onwards to '00:00:00,000000' in the 'Common start time' column
-        self.df_day['Global start time'].iloc[1:] = '0'
-
-        # Set all rows from index 1 onwards to '00:00:00,000000' in the 'Common end time' column
-        self.df_day['Global end time'].iloc[1:] = '0'
-
-
-        print(common_start_time)
-        print(common_end_time)
+        print(microseconds_to_time(common_start_time))
+        print(microseconds_to_time(common_end_time))
         return common_start_time, common_end_time
     
     
@@ -556,18 +1521,15 @@ class DataProcessor:
 
 
             Return:
-                first_video_p1, first_video_p2, first_video_p3,: video names used later to call the files from the df_dict
-                last_video_p1, last_video_p2, last_video_p3: video names used later to call the files from the df_dict
+                first_video_p1, first_video_p2, first_video_p3,: video names used later to find the frames of the files
+                last_video_p1, last_video_p2, last_video_p3: video names used later to find the frames of the files
                 fvp1, fvp2, fvp3 : First video of the session from each location
                 lvp1, lvp2, lvp3 : Last video of the session from each location
 
 
         """
-        # Assuming 'X' contains the time in the format "17:01:43.728497"
-        X = self.common_start_time
-
-        # Convert 'X' to a pandas Timestamp object for comparison
-        common_start_time_timestamp = pd.to_datetime(X, format="%H:%M:%S.%f")
+        # Global start time in microseconds since midnight
+        common_start_time_timestamp = self.common_start_time
 
         # Create a dictionary to store the dataframes and their corresponding variables
         dataframes = {'df_p1': self.df_p1.copy(), 'df_p2': self.df_p2.copy(), 'df_p3': self.df_p3.copy()}
@@ -579,10 +1541,6 @@ class DataProcessor:
 
         # Iterate over the dataframes
         for df_name, df in dataframes.items():
-            # Convert the 'start_timestamp' and 'end_timestamp' columns in the current dataframe to pandas Timestamp objects
-            df['start_timestamp'] = pd.to_datetime(df['start_timestamp'], format="%H:%M:%S.%f")
-            df['end_timestamp'] = pd.to_datetime(df['end_timestamp'], format="%H:%M:%S.%f")
-
             # Find the row where 'common_start_time_timestamp' falls within the 'start_timestamp' and 'end_timestamp' interval
             selected_row = df[(df['start_timestamp'] <= common_start_time_timestamp) & (df['end_timestamp'] >= common_start_time_timestamp)]
 
@@ -601,10 +1559,8 @@ class DataProcessor:
         #Finding the file name that contain the global end time
 
 
-        X = self.common_end_time
-
-        # Convert 'X' to a pandas Timestamp object for comparison
-        common_end_time_timestamp = pd.to_datetime(X, format="%H:%M:%S.%f")
+        # Global end time in microseconds since midnight
+        common_end_time_timestamp = self.common_end_time
 
         # Create a dictionary to store the dataframes and their corresponding variables
         dataframes = {'df_p1': self.df_p1.copy(), 'df_p2': self.df_p2.copy(), 'df_p3': self.df_p3.copy()}
@@ -616,10 +1572,6 @@ class DataProcessor:
 
         # Iterate over the dataframes
         for df_name, df in dataframes.items():
-            # Convert the 'start_timestamp' and 'end_timestamp' columns in the current dataframe to pandas Timestamp objects
-            df['start_timestamp'] = pd.to_datetime(df['start_timestamp'], format="%H:%M:%S.%f")
-            df['end_timestamp'] = pd.to_datetime(df['end_timestamp'], format="%H:%M:%S.%f")
-
             # Find the row where 'common_start_time_timestamp' falls within the 'start_timestamp' and 'end_timestamp' interval
             selected_row = df[(df['start_timestamp'] <= common_end_time_timestamp) & (df['end_timestamp'] >= common_end_time_timestamp)]
 
@@ -639,6 +1591,46 @@ class DataProcessor:
 
         
 
+    def frame_at(self, recording, time, side='after'):
+        """
+        Finds the frame of a recording closest to a time with a binary search over its timestamps.
+
+        The timestamps of the frames of a recording only go forward, so the frame is found in O(log n).
+
+        Args:
+            recording : Name of the recording, position and drone followed by the Video_ID, e.g. P1D1_DJI_0123
+            time : Time in microseconds since midnight
+            side : 'after' for the first frame at or after the time, 'before' for the last frame at or before it
+
+        Return:
+            frame : Frame number, or None if the recording has no frame on that side of the time. Frames sharing a
+            timestamp resolve to the first of them.
+        """
+        df_fr = self.recording(recording)
+
+        # Read the frames of a recording that was only scanned or streamed
+        if df_fr.empty:
+            if recording not in self.scanned_frames:
+                self.scanned_frames[recording] = pd.DataFrame(parse_srt(self.srt_files[recording]), copy=False)
+            df_fr = self.scanned_frames[recording]
+
+        timestamps = df_fr['timestamp'].values
+
+        if side == 'after':
+            index = np.searchsorted(timestamps, time, side='left')
+            if index == len(timestamps):
+                return None
+        elif side == 'before':
+            index = np.searchsorted(timestamps, time, side='right') - 1
+            if index < 0:
+                return None
+            # Go back to the first frame with the same timestamp
+            index = np.searchsorted(timestamps, timestamps[index], side='left')
+        else:
+            raise ValueError(f"side must be 'after' or 'before', not {side!r}")
+
+        return df_fr['frame'].values[index]
+
     def startendframe(self):
 
         """
@@ -651,10 +1643,10 @@ class DataProcessor:
             df_p3: dataframe of the session from position 3
             common_start_time: Global start time of the session
             common_end_time  : Global end time of the session
-            first_video_p1, first_video_p2, first_video_p3,: video names used to call the the dataframe of
-            the first video files from the df_dict of each location
-            last_video_p1, last_video_p2, last_video_p3: video names used to call the the dataframe of
-            the last video files from the df_dict of each location
+            first_video_p1, first_video_p2, first_video_p3,: video names used to find the frames of
+            the first video files of each location
+            last_video_p1, last_video_p2, last_video_p3: video names used to find the frames of
+            the last video files of each location
             fvp1, fvp2, fvp3 : First video of the session from each location
             lvp1, lvp2, lvp3 : Last video of the session from each location
 
@@ -664,11 +1656,7 @@ class DataProcessor:
 
 
         #FOR FINDING THE FIRST FRAMES
-        import datetime
 
-        #FOR FINDING THE FIRST FRAMES
-
-        from datetime import datetime, date, time
         # List of first_video_p values
         first_video_p_list = [self.first_video_p1, self.first_video_p2, self.first_video_p3]
 
@@ -677,35 +1665,8 @@ class DataProcessor:
 
         # Loop through each first_video_p value
         for first_video_p in first_video_p_list:
-            data_frame = self.df_dict.get(first_video_p)
-            df_fr = data_frame.copy()
-
-
-            df_fr['timestamp'] = df_fr['timestamp'].str.replace(',', '')
-            # Convert the timestamp columns to datetime type
-            df_fr['timestamp'] = pd.to_datetime(df_fr['timestamp'], format='%H:%M:%S%f')
-            # Remove the dates from the timestamp columns
-            df_fr['timestamp'] = df_fr['timestamp'].dt.time
-
-
-            def calculate_time_difference(row):
-                common_datetime = datetime.combine(date.today(), self.common_start_time)
-
-                timestamp_datetime = datetime.combine(date.today(), row['timestamp'])
-                time_difference = (timestamp_datetime - common_datetime).total_seconds()
-                return time_difference
-
-
-            df_fr['time_diff'] = df_fr.apply(calculate_time_difference, axis=1)
-
-
-            positive_time_diff_df = df_fr[df_fr['time_diff'] >= 0]
-
-            # Step 5: Find the row with the smallest positive time difference
-            min_positive_time_diff_row = positive_time_diff_df.loc[positive_time_diff_df['time_diff'].idxmin()]
-
-            # Step 6: Get the corresponding frame value
-            corresponding_frame = min_positive_time_diff_row['frame']
+            # Find the first frame at or after the global start time
+            corresponding_frame = self.frame_at(first_video_p, self.common_start_time, side='after')
 
             # Save corresponding_frame in the dictionary for the current first_video_p
             corresponding_frame_dict[first_video_p] = corresponding_frame
@@ -721,41 +1682,16 @@ class DataProcessor:
         print("Corresponding Frame for first_video_p3:", first_frame_p3)
 
         #FOR FINDING THE LAST FRAMES# List of last_video_p values
-            #FOR FINDING THE LAST FRAMES# List of last_video_p values
-        from datetime import datetime, date, time
         # List of last_video_p values
         last_video_p_list = [self.last_video_p1, self.last_video_p2, self.last_video_p3]
 
         # Dictionary to store corresponding_frame for each first_video_p
         corresponding_frame_dict = {}
 
-        # Loop through each first_video_p value
+        # Loop through each last_video_p value
         for last_video_p in last_video_p_list:
-            data_frame = self.df_dict.get(last_video_p)
-            df_fr = data_frame.copy()
-
-
-            df_fr['timestamp'] = df_fr['timestamp'].str.replace(',', '')
-            # Convert the timestamp columns to datetime type
-            df_fr['timestamp'] = pd.to_datetime(df_fr['timestamp'], format='%H:%M:%S%f')
-            # Remove the dates from the timestamp columns
-            df_fr['timestamp'] = df_fr['timestamp'].dt.time
-
-            def calculate_time_difference(row):
-                common_datetime = datetime.combine(date.today(), self.common_end_time)
-
-                timestamp_datetime = datetime.combine(date.today(), row['timestamp'])
-                time_difference = (common_datetime - timestamp_datetime).total_seconds()
-                return time_difference
-
-            df_fr['time_diff'] = df_fr.apply(calculate_time_difference, axis=1)
-            positive_time_diff_df = df_fr[df_fr['time_diff'] >= 0]
-
-            # Step 5: Find the row with the smallest positive time difference
-            min_positive_time_diff_row = positive_time_diff_df.loc[positive_time_diff_df['time_diff'].idxmin()]
-
-            # Step 6: Get the corresponding frame value
-            corresponding_frame = min_positive_time_diff_row['frame']
+            # Find the last frame at or before the global end time
+            corresponding_frame = self.frame_at(last_video_p, self.common_end_time, side='before')
 
             # Save corresponding_frame in the dictionary for the current first_video_p
             corresponding_frame_dict[last_video_p] = corresponding_frame
@@ -839,16 +1775,8 @@ class DataProcessor:
         #Checking for frame drops
         df_x = self.df_day.copy()
 
-        # Remove the comma before microseconds
-        df_x['start_timestamp'] = df_x['start_timestamp'].str.replace(',', '')
-        df_x['end_timestamp'] = df_x['end_timestamp'].str.replace(',', '')
-
-            # Convert the timestamp columns to datetime type
-        df_x['start_timestamp'] = pd.to_datetime(df_x['start_timestamp'], format='%H:%M:%S%f')
-        df_x['end_timestamp'] = pd.to_datetime(df_x['end_timestamp'], format='%H:%M:%S%f')
-
-        # Calculate the time difference and store the absolute value in the "end_start_diff" column
-        df_x['Global TOF'] = (df_x['end_timestamp'] - df_x['start_timestamp']).dt.total_seconds().abs()
+        # Calculate the time difference in seconds and store the absolute value in the "Global TOF" column
+        df_x['Global TOF'] = ((df_x['end_timestamp'] - df_x['start_timestamp']) / 1000000).abs()
         #30 fps video
         df_x['Required frames'] = df_x['Global TOF'] * 30
 
@@ -864,11 +1792,54 @@ class DataProcessor:
         self.df_day.loc[df_x.index, 'Required frames'] = df_x['Required frames'].values
 
    
+    def videoconsistency(self, workers=1):
+        """
+        Pairs every srt file with the mp4 file of the same Video_ID in its folder, checks the boxes of the video and
+        compares its frame count and duration with the srt file. Only the boxes of the videos are read, in a thread
+        pool as the time goes to the disk.
+
+        Args:
+            df_day : dataframe of the session
+            video_paths : mp4 files of every folder found by sortedfolders
+            workers : Number of videos read at the same time
+
+        Return:
+            df_day : Updated dataframe of the session with the VIDEO_COLUMNS
+            videos_without_srt : mp4 files without an srt file
+            video_summaries : Dictionary of every mp4 file to its corrupted flag, error, frame count and duration
+        """
+        # Video of every position, drone and Video_ID
+        videos = {}
+        for folder, paths in self.video_paths.items():
+            for path in paths:
+                videos[(folder[-4:], os.path.basename(path)[-12:-4])] = path
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            summaries = dict(zip(videos, pool.map(summarise_video, videos.values())))
+        self.video_summaries = {videos[key]: summary for key, summary in summaries.items()}
+
+        keys = list(zip(self.df_day['position'] + self.df_day['drone'], self.df_day['Video_ID']))
+        self.videos_without_srt = [videos[key] for key in videos if key not in set(keys)]
+
+        # Recordings without a video keep the video columns empty
+        rows = [summaries.get(key, {}) for key in keys]
+        self.df_day['Video file'] = [os.path.basename(videos[key]) if key in videos else '' for key in keys]
+        self.df_day['Missing video'] = [0 if key in videos else 1 for key in keys]
+        self.df_day['Video corrupted'] = [row.get('corrupted') for row in rows]
+        self.df_day['Video error'] = [row.get('error', '') for row in rows]
+        self.df_day['Video frames'] = pd.to_numeric(pd.Series([row.get('frame count') for row in rows], index=self.df_day.index, dtype=object))
+        self.df_day['Video duration'] = pd.to_numeric(pd.Series([row.get('duration') for row in rows], index=self.df_day.index, dtype=object))
+
+        # Compare the video with the frames and the end time of the last frame of the srt file
+        self.df_day['Frame count mismatch'] = ((self.df_day['Video frames'] - self.df_day['Total frames']).abs() > VIDEO_FRAME_TOLERANCE).astype(int)
+        self.df_day['Duration mismatch'] = ((self.df_day['Video duration'] - self.df_day['Frame time']).abs() > VIDEO_DURATION_TOLERANCE).astype(int)
+
     def savecsv(self):
 
 
-        # Rearrange the columns to match the desired position
-        self.df_day = self.df_day[['Unique name', 'Video_ID','position', 'drone','Total frames', 'start_timestamp', 'end_timestamp', 'flight number', 'Relay video',  'maximum drift'  , 'drift_status', 'Miss click', 'maximum height', 'minimum height','Global start time','Global end time', 'Start Frame', 'End Frame','Frame drop','Frame time', 'Global TOF','Required frames', 'File path']]
+        # Rearrange the columns to match the desired position, the video columns only when the videos were checked
+        video_columns = [column for column in VIDEO_COLUMNS if column in self.df_day]
+        self.df_day = self.df_day[['Unique name', 'Video_ID','position', 'drone','Total frames', 'start_timestamp', 'end_timestamp', 'flight number', 'Relay video',  'maximum drift'  , 'drift_status', 'Miss click', 'maximum height', 'minimum height','Global start time','Global end time', 'Start Frame', 'End Frame','Frame drop','Frame time', 'Global TOF','Required frames'] + video_columns + ['File path']]
 
 
         input_string = self.df_day['Unique name'][0]  # Replace with the actual input string
@@ -877,18 +1848,36 @@ class DataProcessor:
         # Use os.path.join to create the full path to the CSV file
         csv_file_path = os.path.join(self.session_location, f'{self.name}.csv')
 
+        # Format the times, kept in microseconds since midnight, the way the srt files write them
+        df_csv = self.df_day.copy()
+        df_csv['start_timestamp'] = df_csv['start_timestamp'].apply(format_timestamp)
+        df_csv['end_timestamp'] = df_csv['end_timestamp'].apply(format_timestamp)
+
+        # Only the first row holds the global start and end time, the rest of the rows are 0
+        df_csv['Global start time'] = [format_common_time(t) if i == 0 else '0' for i, t in zip(df_csv.index, df_csv['Global start time'])]
+        df_csv['Global end time'] = [format_common_time(t) if i == 0 else '0' for i, t in zip(df_csv.index, df_csv['Global end time'])]
+
         # Save the DataFrame to the specified location
-        self.df_day.to_csv(csv_file_path, index=False)
+        df_csv.to_csv(csv_file_path, index=False)
+
+        return df_csv
 
     def savetext(self):
 
         #CREATES TXT FILE IF ANY ERROR FOUND IN DRIFT OR MISS CLICK
 
         # Filter rows where 'drift_status' or 'Miss click' is equal to 1
-        filtered_df = self.df_day[(self.df_day['drift_status'] == 1) | (self.df_day['Miss click'] == 1) | (self.df_day['minimum height'] < 78) | (self.df_day['Frame drop'] == 1)]
+        errors = (self.df_day['drift_status'] == 1) | (self.df_day['Miss click'] == 1) | (self.df_day['minimum height'] < 78) | (self.df_day['Frame drop'] == 1)
+
+        # Add the problems with the videos when they were checked
+        videos_checked = 'Missing video' in self.df_day
+        if videos_checked:
+            errors |= (self.df_day['Missing video'] == 1) | (self.df_day['Video corrupted'] == 1) | (self.df_day['Frame count mismatch'] == 1) | (self.df_day['Duration mismatch'] == 1)
+        videos_without_srt = getattr(self, 'videos_without_srt', []) if videos_checked else []
+        filtered_df = self.df_day[errors]
 
         # If there are any rows with 'drift_status' or 'Miss click' equal to 1, create the text file
-        if not filtered_df.empty:
+        if not filtered_df.empty or videos_without_srt:
             file_name = os.path.join(self.session_location, f"{self.name}_summary.txt")
 
             # Create the text file and write the content
@@ -906,56 +1895,126 @@ class DataProcessor:
                         f.write(f"Drone flew below 78m at the {video_id}, height = {height} m \n")
                     if row['Frame drop'] == 1:
                         f.write(f"Frame drop at the {video_id}\n") 
+                    if videos_checked and row['Missing video'] == 1:
+                        f.write(f"No video found for the {video_id}\n")
+                    if videos_checked and row['Video corrupted'] == 1:
+                        f.write(f"Corrupted video at the {video_id}, {row['Video error']}\n")
+                    if videos_checked and row['Frame count mismatch'] == 1:
+                        f.write(f"Video of the {video_id} has {row['Video frames']:.0f} frames, the srt file {row['Total frames']}\n")
+                    if videos_checked and row['Duration mismatch'] == 1:
+                        f.write(f"Video of the {video_id} lasts {row['Video duration']:.3f}s, the srt file {row['Frame time']:.3f}s\n")
+                for video_path in videos_without_srt:
+                    f.write(f"No srt file found for the video {video_path}\n")
+
 
 
+    def savecatalog(self, catalog_file):
+        """
+        Saves the srt and mp4 files and the recordings of the session to the SQLite catalog shared with
+        videocorruption and Renaming, replacing what an earlier run saved for the session. The verdicts of the videos
+        are saved too when they were checked.
+
+        Args:
+            catalog_file : Path of the SQLite catalog
+        """
+        catalog = Catalog(catalog_file)
+        srt_paths = [file for folder in self.folders for file in self.srt_paths.get(folder, [])]
+        video_paths = [file for folder in self.folders for file in self.video_paths.get(folder, [])]
+        catalog.add_session(self.session_location, srt_paths, video_paths, self.df_day)
+        if 'Missing video' in self.df_day:
+            catalog.add_verdicts(self.video_summaries)
+        catalog.close()
+
+    def saveparquet(self, folder):
+        """
+        Exports every frame of the session as Parquet, partitioned by date, session, position and drone, e.g.
+        <folder>/date=20230312/session=SE_Lek1/position=P1/drone=D1/frames.parquet
+
+        The frames of a drone are in time order and written in row groups holding the minimum and maximum of
+        every column, so readers filtering on time, frame or position skip the row groups they do not need.
+
+        Args:
+            folder : Folder of the Parquet dataset, shared by every session
+        """
+        session = os.path.normpath(os.path.abspath(self.session_location))
+        date = os.path.basename(os.path.dirname(session))
+        session = os.path.basename(session)
+
+        names = list(self.df_frames['recording'].cat.categories)
+        for drone_folder in sorted({name[:4] for name in names}):
+            # The recordings of a drone follow each other in the frame table
+            indices = [i for i, name in enumerate(names) if name[:4] == drone_folder]
+            start, stop = self.frame_offsets[indices[0]], self.frame_offsets[indices[-1] + 1]
+            df_drone = self.df_frames.iloc[start:stop].drop(columns=['position', 'drone'])
+            df_drone['recording'] = df_drone['recording'].cat.remove_unused_categories()
+
+            partition = os.path.join(folder, f'date={date}', f'session={session}', f'position={drone_folder[:2]}', f'drone={drone_folder[2:]}')
+            os.makedirs(partition, exist_ok=True)
+
+            # Write to a temporary file first so readers never see half a file
+            file_path = os.path.join(partition, 'frames.parquet')
+            table = pa.Table.from_pandas(df_drone, preserve_index=False)
+            pq.write_table(table, file_path + '.tmp', row_group_size=PARQUET_ROW_GROUP_SIZE, write_statistics=True)
+            os.replace(file_path + '.tmp', file_path)
+
+    def occupancy(self, resolution=None):
+        """
+        Number of recordings running for every drone of the session over time.
+
+        Args:
+            df_plot : dataframe to draw the graph
+            resolution : Seconds between samples, or None for the exact step functions
+
+        Return:
+            steps : Dictionary of (position, drone) to the times in microseconds and the number of recordings running
+            from each time until the next one. With a resolution the times are a regular grid over the session.
+        """
+        df_plot = self.df_plot
+        session_start = df_plot['start_timestamp'].min()
+        session_end = df_plot['end_timestamp'].max()
+
+        if resolution is not None:
+            ticks = np.arange(session_start, session_end + 1, int(resolution * 1000000))
+
+        steps = {}
+        for folder, df_drone in df_plot.groupby('folder', sort=True):
+            times, counts = occupancy_steps(df_drone['start_timestamp'].values, df_drone['end_timestamp'].values)
+
+            # Run every drone from the beginning to the end of the session
+            if times[0] > session_start:
+                times = np.concatenate([[session_start], times])
+                counts = np.concatenate([[0], counts])
+            if times[-1] < session_end:
+                times = np.append(times, session_end)
+                counts = np.append(counts, counts[-1])
+
+            if resolution is not None:
+                times, counts = ticks, counts[np.searchsorted(times, ticks, side='right') - 1]
+
+            steps[(folder[:2], folder[2:])] = (times, counts)
+
+        return steps
 
     def plot(self):
 
-        df_plot = self.df_plot.copy()
-        # Convert timestamps to python datetime %H:%M:%S,%f format
-        df_plot['start_timestamp'] = df_plot['start_timestamp'].str[:-4] + df_plot['start_timestamp'].str[-3:]
-        df_plot['end_timestamp'] = df_plot['end_timestamp'].str[:-4] + df_plot['end_timestamp'].str[-3:]
-
-        df_plot['start_timestamp'] = pd.to_datetime(df_plot['start_timestamp'], format= '%H:%M:%S,%f')#.dt.time
-        df_plot['end_timestamp'] = pd.to_datetime(df_plot['end_timestamp'], format='%H:%M:%S,%f')#.dt.time
-
-        # Generate a range of timestamps using the minimum start timestamp and maximum end timestamp, with a 2-second frequency
-        x_values = pd.date_range(df_plot['start_timestamp'].min(), df_plot['end_timestamp'].max(), freq='2S')
-
-        # Initialize an empty list to store data for each drone at each timestamp
-        drone_id = []
-
-        # Iterate over each timestamp in the x_values range
-        for x in x_values:
-            # For each drone, count the number of entries where the start_timestamp is less than or equal to the current timestamp, 
-            # the end_timestamp is greater than the current timestamp, and the folder contains the drone ID
-            drone_id.append([
-                x, 
-                len(df_plot.loc[(df_plot['start_timestamp'] <= x) & (df_plot['end_timestamp'] > x) & (df_plot['folder'].str.contains('D1')),:]),
-                len(df_plot.loc[(df_plot['start_timestamp'] <= x) & (df_plot['end_timestamp'] > x) & (df_plot['folder'].str.contains('D2')),:]),
-                len(df_plot.loc[(df_plot['start_timestamp'] <= x) & (df_plot['end_timestamp'] > x) & (df_plot['folder'].str.contains('D3')),:]),
-                len(df_plot.loc[(df_plot['start_timestamp'] <= x) & (df_plot['end_timestamp'] > x) & (df_plot['folder'].str.contains('D4')),:]),
-                len(df_plot.loc[(df_plot['start_timestamp'] <= x) & (df_plot['end_timestamp'] > x) & (df_plot['folder'].str.contains('D5')),:]),
-                len(df_plot.loc[(df_plot['start_timestamp'] <= x) & (df_plot['end_timestamp'] > x) & (df_plot['folder'].str.contains('D6')),:])
-            ])
-
-        # Create a pandas DataFrame from the drone_id list
-        t = pd.DataFrame(drone_id)
-
-        # Create a figure with 3 subplots and a shared x-axis
-        fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 5), sharex=True)
-
-        # Plot data of drones D1 and D2 on position P1
-        ax1.plot(t[0], t[1], c='blue')
-        ax1.plot(t[0], t[2], c='red')
-
-        # Plot data of drones D3 and D4 on position P2
-        ax2.plot(t[0], t[3], c='blue')
-        ax2.plot(t[0], t[4], c='red')
-
-        # Plot data of drones D5 and D6 on position P3
-        ax3.plot(t[0], t[5], c='blue')
-        ax3.plot(t[0], t[6], c='red')
+        # Exact number of recordings running for every drone
+        steps = self.occupancy()
+        positions = sorted({position for position, drone in steps})
+
+        # Create a figure with a subplot for every position and a shared x-axis
+        fig, axes = plt.subplots(max(len(positions), 1), 1, figsize=(10, 5), sharex=True, squeeze=False)
+        colors = ['blue', 'red']
+
+        for ax, position in zip(axes[:, 0], positions):
+            drones = sorted(drone for drone_position, drone in steps if drone_position == position)
+
+            # Plot data of the drones on the position, the first drone in blue and the second one in red
+            for i, drone in enumerate(drones):
+                times, counts = steps[(position, drone)]
+
+                # Convert the times to datetimes for the time axis of the plot
+                times = pd.Timestamp('1900-01-01') + pd.to_timedelta(times, unit='us')
+                ax.step(times, counts, where='post', c=colors[i] if i < len(colors) else None)
         
         # Save the figure to a file with the desired filename
         plot_file_path = os.path.join(self.session_location, f'{self.name}_flight.png')
@@ -965,38 +2024,167 @@ class DataProcessor:
             # Display the plot only if the user provides the --plot option
             plt.show()
 
+        # Free the figure, a season keeps drawing one for every session
+        plt.close(fig)
 
 
 
 
+
+    def analyse(self, args):
+        """
+        Runs every step of the analysis on the session and saves the csv, text and graph of the session.
+
+        Args:
+            args : Parsed command line arguments
+
+        Return:
+            df_csv : data frame of the session as saved in the csv file
+        """
+        self.args = args
+        profile = getattr(args, 'profile', None)
+        cprofile = getattr(args, 'cprofile', None)
+        memory = getattr(args, 'profile_memory', False)
+        if memory and profile is None:
+            profile = ''
+        self.profiler = StageProfiler(cprofile=bool(cprofile), memory=memory) if profile is not None or cprofile else None
+
+        self.stage('sortedfolders', self.sortedfolders)#sort the srt files
+        cache = SrtCache(args.cache, args.cache_size) if args.cache else None
+        self.stage('dataframecreation', self.dataframecreation, args.drift, args.height, args.workers, cache, self.profiler is not None, getattr(args, 'scan', False), getattr(args, 'stream', False))#creates the data frame
+        self.stage('rearrangecolumns', self.rearrangecolumns)#edits the names in the columns
+        self.stage('missingdata', self.missingdata)#finds miss click errors
+        self.stage('dronenumber', self.dronenumber)#identifies first and second drones in each session
+        self.stage('sortieid', self.sortieid)#finds flight number
+        self.stage('startendtime', self.startendtime)#finds start and end time of the session
+        self.stage('startendfile', self.startendfile)#finds start and end video file of the session
+        self.stage('startendframe', self.startendframe)#finds start and end frame of the session
+        self.stage('framedrop', self.framedrop)#checks for frame drops
+        if getattr(args, 'videos', False):
+            self.stage('videoconsistency', self.videoconsistency, args.workers)#checks the videos against the srt files
+        df_csv = self.stage('savecsv', self.savecsv)#saves the updated data frame
+        self.stage('savetext', self.savetext)#saves the errors as text file
+        self.stage('plot', self.plot)#plots the flight graph
+        if getattr(args, 'parquet', None):
+            self.stage('saveparquet', self.saveparquet, args.parquet)#exports the frames
+        if getattr(args, 'catalog', None):
+            self.stage('savecatalog', self.savecatalog, args.catalog)#saves the session to the catalog
+
+        if self.profiler is not None:
+            self.saveprofile(profile, cprofile)#saves the measurements of the steps
+
+        return df_csv
+
+    def stage(self, name, method, *args):
+        """
+        Runs one step of the analysis, measured when profiling.
+
+        Args:
+            name : Name of the step
+            method : Method running the step
+            args : Arguments of the method
+
+        Return:
+            result : Whatever the method returns
+        """
+        if self.profiler is None:
+            return method(*args)
+
+        result = self.profiler.run(name, method, *args)
+        self.profiler.rows(self)
+        return result
+
+    def saveprofile(self, profile, cprofile):
+        """
+        Saves the measurements of every step and of every parsed file as a JSON report, and the cProfile statistics
+        of the slowest step.
+
+        Args:
+            profile : Path of the JSON report, '' to save it as <name>_profile.json in the session
+            cprofile : Path of the cProfile statistics, or None
+        """
+        self.profiler.files = getattr(self, 'file_profile', [])
+        profile_path = profile or os.path.join(self.session_location, f'{self.name}_profile.json')
+        self.profiler.save(profile_path, self.session_location)
+        print(f"Saved the profile to {profile_path}")
+
+        if cprofile:
+            slowest = self.profiler.dump_slowest(cprofile)
+            print(f"Saved the cProfile statistics of {slowest}, the slowest step, to {cprofile}")
+
+    def watch(self, args):
+        """
+        Watches the session for srt files offloaded from the drones and analyses the session again whenever a file is
+        added, changed or removed. Only those files are parsed, the others are kept from the earlier analyses.
+
+        Args:
+            args : Parsed command line arguments, args.watch being the seconds between two scans of the session
+        """
+        analysed = None
+        previous = None
+        print(f"Watching {self.session_location}, press Ctrl+C to stop")
+
+        try:
+            while True:
+                files = sorted(glob.glob(os.path.join(self.session_location, '*', '*.SRT')))
+                try:
+                    current = {file: srt_signature(file) for file in files}
+                except OSError:
+                    # A file was moved while scanning
+                    current = None
+
+                # Wait for a scan without changes so files still being copied are not parsed
+                if current and current == previous and current != analysed:
+                    try:
+                        self.analyse(args)
+                        print(f"Analysed {len(current)} srt files")
+                    except Exception:
+                        traceback.print_exc()
+                    analysed = current
+
+                previous = current
+                sleep(args.watch)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+
     def main(self):
         parser = argparse.ArgumentParser()
         parser.add_argument('session_location', nargs='?', help='session location of the drone flight')
         parser.add_argument('--showplot', action='store_true', help='Flag to indicate whether to display the plot the flight')
         parser.add_argument('--drift', type=float, default=5, help='Threshold drift value (default is 5)')
         parser.add_argument('--height', type=float, default=7, help='Threshold height value (default is 7)')
+        parser.add_argument('--workers', type=int, default=1, help='Number of processes parsing the srt files (default is 1)')
+        parser.add_argument('--cache', help='Folder caching the parsed srt files between runs')
+        parser.add_argument('--cache-size', type=float, default=SRT_CACHE_SIZE, help=f'Size limit of the cache in MB (default is {SRT_CACHE_SIZE})')
+        parser.add_argument('--watch', type=float, nargs='?', const=2, help='Keep analysing the session as srt files are added, scanning every WATCH seconds (default is 2)')
+        parser.add_argument('--scan', action='store_true', help='Only read the first and last frame of every srt file, leaving heights and drift out of the analysis')
+        parser.add_argument('--stream', action='store_true', help='Summarise every srt file while reading it without keeping its frames, to bound the memory of long sessions')
+        parser.add_argument('--videos', action='store_true', help='Also check the mp4 files of the session and compare their frames and duration with the srt files')
+        parser.add_argument('--parquet', help='Folder of a Parquet dataset the frames of the session are exported to, partitioned by date, session, position and drone')
+        parser.add_argument('--catalog', help='SQLite catalog the files and recordings of the session are saved to, shared with videocorruption and Renaming')
+        parser.add_argument('--profile', nargs='?', const='', help='Save the time, CPU and memory of every step and parsed file as a JSON report (default is <name>_profile.json in the session)')
+        parser.add_argument('--profile-memory', action='store_true', help='Also trace the memory allocated by Python in every step with tracemalloc, which slows the steps down (implies --profile)')
+        parser.add_argument('--cprofile', help='Run every step under cProfile and save the statistics of the slowest one to this file')
+        parser.add_argument('--season', action='store_true', help='Analyse every session found under the location, --workers sessions at a time')
         args = parser.parse_args()
         self.args = parser.parse_args()
 
+        if args.parquet and pa is None:
+            parser.error('--parquet needs the pyarrow package')
+        if args.parquet and (args.scan or args.stream):
+            parser.error('--parquet needs every frame, it cannot be used with --scan or --stream')
+
         if args.session_location:
             self.session_location = args.session_location
         else:
             self.sessionlocation()  # Gets the srt location
 
-        if self.validfolder():#check if path is present
-            self.sortedfolders()#sort the srt files
-            self.dataframecreation(args.drift, args.height)#creates the data frame
-            self.rearrangecolumns()#edits the names in the columns
-            self.missingdata()#finds miss click errors
-            self.dronenumber()#identifies first and second drones in each session
-            self.sortieid()#finds flight number
-            self.startendtime()#finds start and end time of the session
-            self.startendfile()#finds start and end video file of the session
-            self.startendframe()#finds start and end frame of the session
-            self.framedrop()#checks for frame drops
-            self.savecsv()#saves the updated data frame
-            self.savetext()#saves the errors as text file
-            self.plot()#plots the flight graph
+        if self.validfolder() and args.season:#check if path is present
+            analyse_season(self.session_location, args)#analyses every session of the season
+        elif self.validfolder() and args.watch:
+            self.watch(args)#analyses the session as the files come in
+        elif self.validfolder():
+            self.analyse(args)#analyses the session
                 
         else:
             print("Invalid file path or the file does not exist.")
@@ -8,50 +8,565 @@
 #Checks for correpted video files
 
 import os
-import cv2
+import json
+import struct
+import numpy as np
 import pandas as pd
 import argparse
+import multiprocessing
+from time import perf_counter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from catalog import Catalog
+
+try:
+    import cv2
+except ImportError:
+    # Only needed for the deep check decoding the videos
+    cv2 = None
+
+# Number of evenly spaced frames decoded by the deep check
+DEEP_CHECK_SAMPLES = 10
+
+# Seconds the deep check of one video may take before it is stopped
+DEEP_CHECK_BUDGET = 60
+
+# Seconds a deep check is given on top of its budget to open the video and finish its last seek before it is killed
+DEEP_CHECK_GRACE = 5
+
+# Boxes holding other boxes on the way from moov to the sample tables
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+def read_boxes(f, start, end):
+    """
+    Reads the headers of the boxes between two offsets of an mp4 file.
+
+    Args:
+        f : mp4 file opened in binary mode
+        start : Offset of the first box
+        end : Offset the boxes have to end at, the size of the file for the top level boxes
+
+    Return:
+        boxes : List of the type, payload offset and end offset of every box
+        error : Description of the first broken box, None if the boxes fill the range exactly
+    """
+    boxes = []
+    offset = start
+
+    while offset < end:
+        if end - offset < 8:
+            return boxes, f"{end - offset} stray bytes at offset {offset}"
+
+        f.seek(offset)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            # 64 bit size following the type
+            data = f.read(8)
+            if len(data) < 8:
+                return boxes, f"box '{box_type.decode('ascii', errors='replace')}' cut in its header at offset {offset}"
+            size = struct.unpack('>Q', data)[0]
+            header = 16
+        elif size == 0:
+            # The box runs to the end of the file
+            size = end - offset
+
+        if size < header:
+            return boxes, f"box '{box_type.decode('ascii', errors='replace')}' with invalid size {size} at offset {offset}"
+        if offset + size > end:
+            return boxes, f"box '{box_type.decode('ascii', errors='replace')}' at offset {offset} runs {offset + size - end} bytes past the end"
+
+        boxes.append((box_type, offset + header, offset + size))
+        offset += size
+
+    return boxes, None
+
+
+def read_sample_tables(f, start, end, tables):
+    """
+    Collects the sample size and chunk offset tables of every track inside moov.
+
+    Args:
+        f : mp4 file opened in binary mode
+        start : Offset of the payload of the box
+        end : End offset of the box
+        tables : List the (sample bytes, chunk offsets) of every sample table are appended to
+
+    Return:
+        error : Description of the first broken box, None if the boxes are complete
+    """
+    boxes, error = read_boxes(f, start, end)
+    if error:
+        return error
+
+    sample_bytes = None
+    chunk_offsets = None
+    for box_type, payload, box_end in boxes:
+        if box_type in MP4_CONTAINER_BOXES:
+            error = read_sample_tables(f, payload, box_end, tables)
+            if error:
+                return error
+        elif box_type == b'stsz':
+            f.seek(payload)
+            version, sample_size, sample_count = struct.unpack('>III', f.read(12))
+            if sample_size:
+                sample_bytes = sample_size * sample_count
+            else:
+                if payload + 12 + 4 * sample_count > box_end:
+                    return "sample size table longer than its box"
+                sample_bytes = int(np.frombuffer(f.read(4 * sample_count), dtype='>u4').sum(dtype=np.int64))
+        elif box_type in (b'stco', b'co64'):
+            f.seek(payload)
+            version, entry_count = struct.unpack('>II', f.read(8))
+            width = 4 if box_type == b'stco' else 8
+            if payload + 8 + width * entry_count > box_end:
+                return "chunk offset table longer than its box"
+            chunk_offsets = np.frombuffer(f.read(width * entry_count), dtype='>u4' if width == 4 else '>u8')
+
+    if sample_bytes is not None or chunk_offsets is not None:
+        tables.append((sample_bytes or 0, chunk_offsets if chunk_offsets is not None else np.empty(0, dtype=np.uint64)))
+
+    return None
+
+
+def check_mp4_boxes(video_path):
+    """
+    Checks the structure of an mp4 file without decoding it: the top level boxes have to fill the file exactly,
+    ftyp, moov and mdat have to be there, and the samples listed in moov have to fit inside mdat.
+    Only the box headers and the sample tables are read.
+
+    Args:
+        video_path : Path of the mp4 file
+
+    Return:
+        error : Description of the problem, None if the file is complete
+    """
+    size = os.path.getsize(video_path)
+
+    with open(video_path, 'rb') as f:
+        boxes, error = read_boxes(f, 0, size)
+        if error:
+            return f"truncated or broken file, {error}"
+
+        box_types = [box_type for box_type, payload, box_end in boxes]
+        for required in (b'ftyp', b'moov', b'mdat'):
+            if required not in box_types:
+                return f"missing {required.decode()} box"
+
+        # Sample tables of every track
+        tables = []
+        for box_type, payload, box_end in boxes:
+            if box_type == b'moov':
+                error = read_sample_tables(f, payload, box_end, tables)
+                if error:
+                    return f"broken moov box, {error}"
+
+    # The media data has to hold every sample and every chunk has to start inside it
+    mdat = [(payload, box_end) for box_type, payload, box_end in boxes if box_type == b'mdat']
+    mdat_bytes = sum(box_end - payload for payload, box_end in mdat)
+    sample_bytes = sum(table_bytes for table_bytes, chunk_offsets in tables)
+    if sample_bytes > mdat_bytes:
+        return f"samples need {sample_bytes} bytes but mdat holds {mdat_bytes}"
+
+    for table_bytes, chunk_offsets in tables:
+        inside = np.zeros(len(chunk_offsets), dtype=bool)
+        for payload, box_end in mdat:
+            inside |= (chunk_offsets >= payload) & (chunk_offsets < box_end)
+        if not inside.all():
+            return f"{int((~inside).sum())} chunks start outside mdat"
+
+    return None
+
+
+def find_boxes(f, start, end, box_type):
+    """
+    Returns the payload and end offsets of the boxes of a type between two offsets of an mp4 file.
+    """
+    boxes, error = read_boxes(f, start, end)
+    return [(payload, box_end) for found_type, payload, box_end in boxes if found_type == box_type]
+
+
+def read_mp4_metadata(video_path):
+    """
+    Reads the frame count, duration and fps of the video track from the moov box, without decoding the video.
+
+    Args:
+        video_path : Path of the mp4 file
+
+    Return:
+        metadata : Dictionary of the frame count, duration in seconds and fps, empty if there is no video track
+    """
+    size = os.path.getsize(video_path)
+
+    with open(video_path, 'rb') as f:
+        for moov in find_boxes(f, 0, size, b'moov')[:1]:
+            for trak in find_boxes(f, *moov, b'trak'):
+                for mdia in find_boxes(f, *trak, b'mdia')[:1]:
+                    # Only the video track, the handler type follows the version, flags and 4 reserved bytes
+                    handler = find_boxes(f, *mdia, b'hdlr')
+                    if not handler:
+                        continue
+                    f.seek(handler[0][0] + 8)
+                    if f.read(4) != b'vide':
+                        continue
+
+                    # Time scale and duration of the track, 64 bit times in version 1
+                    header = find_boxes(f, *mdia, b'mdhd')
+                    if not header:
+                        continue
+                    f.seek(header[0][0])
+                    version = f.read(4)[0]
+                    if version == 1:
+                        creation, modification, timescale, duration = struct.unpack('>QQIQ', f.read(28))
+                    else:
+                        creation, modification, timescale, duration = struct.unpack('>IIII', f.read(16))
+
+                    # One sample per frame in the sample size table
+                    frame_count = None
+                    for minf in find_boxes(f, *mdia, b'minf')[:1]:
+                        for stbl in find_boxes(f, *minf, b'stbl')[:1]:
+                            for stsz in find_boxes(f, *stbl, b'stsz')[:1]:
+                                f.seek(stsz[0] + 8)
+                                frame_count = struct.unpack('>I', f.read(4))[0]
+
+                    seconds = duration / timescale if timescale else None
+                    return {
+                        'frame count': frame_count,
+                        'duration': seconds,
+                        'fps': frame_count / seconds if frame_count is not None and seconds else None,
+                    }
+
+    return {}
+
+
+def sample_decode(video_path, samples=DEEP_CHECK_SAMPLES, budget=DEEP_CHECK_BUDGET):
+    """
+    Decodes frames at evenly spaced positions of a video, seeking to each one instead of decoding the whole file.
+
+    Args:
+        video_path : Path of the mp4 file
+        samples : Number of frames decoded
+        budget : Seconds after which no more frames are decoded
+
+    Return:
+        result : Dictionary of the frame count, fps and duration in seconds of the container, the first frame
+        that could not be decoded and its time in seconds (None if every sample decoded), the error, and if the check
+        could not finish so the video is neither playable nor corrupted
+    """
+    result = {'frame count': None, 'fps': None, 'duration': None, 'first bad frame': None, 'first bad time': None, 'error': '', 'check failed': False}
+    begin = perf_counter()
+    cap = cv2.VideoCapture(video_path)
+
+    try:
+        if not cap.isOpened():
+            result['error'] = 'OpenCV cannot open the video'
+            return result
+
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        result['frame count'] = frame_count
+        result['fps'] = fps
+        result['duration'] = frame_count / fps if fps else None
+
+        if frame_count <= 0:
+            result['error'] = 'no frames in the video'
+            return result
+
+        # The first and last frames are always among the samples
+        for position in np.unique(np.linspace(0, frame_count - 1, max(samples, 2)).astype(int)):
+            if perf_counter() - begin > budget:
+                result['error'] = f'deep check stopped after the time budget of {budget}s'
+                result['check failed'] = True
+                break
+
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                result['first bad frame'] = int(position)
+                result['first bad time'] = position / fps if fps else None
+                result['error'] = f'frame {position} cannot be decoded'
+                break
+    finally:
+        cap.release()
+
+    return result
+
+
+def run_decode(video_path, samples, budget, connection):
+    """
+    Runs sample_decode in a child process and sends the result back to the parent.
+    """
+    try:
+        connection.send(sample_decode(video_path, samples, budget))
+    except Exception as e:
+        connection.send({'error': f'deep check failed, OpenCV error {e}', 'check failed': True})
+    finally:
+        connection.close()
+
+
+def deep_check(video_path, samples=DEEP_CHECK_SAMPLES, budget=DEEP_CHECK_BUDGET):
+    """
+    Runs sample_decode in its own process, killed if it takes longer than its budget so that a video hanging
+    the decoder cannot stall the other checks.
+
+    Args:
+        video_path : Path of the mp4 file
+        samples : Number of frames decoded
+        budget : Seconds the check may take
+
+    Return:
+        result : Dictionary returned by sample_decode
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_decode, args=(video_path, samples, budget, sender), daemon=True)
+    process.start()
+    sender.close()
+
+    # sample_decode stops itself after the budget, the grace covers opening the video and one last seek
+    try:
+        if receiver.poll(budget + DEEP_CHECK_GRACE):
+            result = receiver.recv()
+        else:
+            result = {'error': f'deep check killed after the time budget of {budget}s', 'check failed': True}
+    except EOFError:
+        result = {'error': 'deep check crashed', 'check failed': True}
+    finally:
+        receiver.close()
+
+    process.join(1)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+    return result
+
+
+def check_video(video_path, samples=0, budget=DEEP_CHECK_BUDGET):
+    """
+    Checks if a video is complete, and with samples if frames spread over the video can be decoded.
+
+    Args:
+        video_path : Path of the mp4 file
+        samples : Number of frames decoded once the boxes are complete, 0 to only check the boxes
+        budget : Seconds the decoding of one video may take
+
+    Return:
+        corrupted : 0 if the video is playable, 1 if it is not, None if the deep check could not finish
+        error : Description of the problem, '' if the video is playable
+        result : Dictionary of the frame count, fps, duration and first undecodable frame of the deep check
+    """
+    # Check the boxes of the file first, it only reads a few KB
+    try:
+        error = check_mp4_boxes(video_path)
+    except (OSError, struct.error) as e:
+        error = f"cannot read the file, {e}"
+
+    if error is not None:
+        return 1, error, {}
+
+    if not samples:
+        return 0, '', {}
+
+    result = deep_check(video_path, samples, budget)
+    error = result.pop('error')
+
+    # A check cut short by its budget or a crash says nothing about the video, it is left unknown
+    if result.pop('check failed', False):
+        print(f"Could not check video '{os.path.basename(video_path)}': {error}")
+        return None, error, result
+
+    if error:
+        print(f"Error while reading video '{os.path.basename(video_path)}': {error}")
+
+    return int(bool(error)), error, result
+
+
+def summarise_video(video_path):
+    """
+    Checks the boxes of a video and reads its frame count and duration, for srtanalyzer to compare with the srt file.
+
+    Args:
+        video_path : Path of the mp4 file
+
+    Return:
+        summary : Dictionary of the corrupted flag, the error, the frame count and the duration in seconds
+    """
+    corrupted, error, result = check_video(video_path)
+    try:
+        metadata = {} if corrupted else read_mp4_metadata(video_path)
+    except (OSError, struct.error):
+        metadata = {}
+
+    return {
+        'corrupted': corrupted,
+        'error': error,
+        'frame count': metadata.get('frame count'),
+        'duration': metadata.get('duration'),
+    }
+
+
+class VideoCache:
+    """
+    Verdicts of earlier checks kept in a JSON file, so videos that did not change since are not checked again.
+
+    Every video is keyed by its path and holds its size and modification time, and the verdict of every check
+    level it went through: 'container' for the box check and 'deepN' for the deep check decoding N frames.
+    """
+    def __init__(self, cache_file):
+        """
+        Args:
+            cache_file : Path of the JSON file, created if it does not exist
+        """
+        self.cache_file = cache_file
+
+        try:
+            with open(cache_file) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def load(self, video_path, level):
+        """
+        Returns the verdict of a check level for a video, or None if the video changed or was not checked at that level.
+        """
+        entry = self.entries.get(os.path.abspath(video_path))
+        # A video removed or renamed since it was listed is a cache miss, its check reports it
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            return None
+
+        verdict = entry['levels'].get(level)
+        return None if verdict is None else tuple(verdict)
+
+    def store(self, video_path, level, verdict):
+        """
+        Keeps the verdict of a check level for a video, dropping the verdicts of an older version of the file.
+        """
+        key = os.path.abspath(video_path)
+        # A video removed or renamed during its check has nothing to cache
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return
+        entry = self.entries.get(key)
+        if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'levels': {}}
+            self.entries[key] = entry
+
+        entry['levels'][level] = list(verdict)
+
+    def save(self):
+        """
+        Removes the videos that were deleted and writes the cache.
+        """
+        self.entries = {key: entry for key, entry in self.entries.items() if os.path.exists(key)}
+
+        # Write to a temporary file first so an interrupted run never leaves a broken cache
+        temp_path = self.cache_file + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.cache_file)
+
 
 class VideoChecker:
-    def __init__(self, root_folder):
+    def __init__(self, root_folder, workers=1, processes=False, samples=0, budget=DEEP_CHECK_BUDGET, cache=None):
+        """
+        Args:
+            root_folder : Folder of the session, holding a folder of drone folders for every section
+            workers : Number of videos checked at the same time
+            processes : Check the videos in processes instead of threads
+            samples : Number of frames decoded in every complete video, 0 to only check the boxes
+            budget : Seconds the decoding of one video may take
+            cache : VideoCache of the verdicts of earlier runs, or None to check every video
+        """
         self.root_folder = root_folder
+        self.workers = workers
+        self.processes = processes
+        self.samples = samples
+        self.budget = budget
+        self.cache = cache
 
-    def check_playable_videos(self):
-        video_data = []
+    def find_videos(self):
+        """
+        Lists the mp4 files of the session in sorted section, drone and file order.
 
-        for folder_name in os.listdir(self.root_folder):
+        Return:
+            videos : List of the file name, path, drone id and section of every video
+        """
+        videos = []
+
+        for folder_name in sorted(os.listdir(self.root_folder)):
             folder_path = os.path.join(self.root_folder, folder_name)
 
             if os.path.isdir(folder_path):
-                for subfolder_name in os.listdir(folder_path):
+                for subfolder_name in sorted(os.listdir(folder_path)):
                     subfolder_path = os.path.join(folder_path, subfolder_name)
 
                     if os.path.isdir(subfolder_path):
-                        for video_file in os.listdir(subfolder_path):
+                        for video_file in sorted(os.listdir(subfolder_path)):
                             if video_file.lower().endswith(".mp4"):  # Only process mp4 files
-                                video_path = os.path.join(subfolder_path, video_file)
-
-                                # Initialize 'corrupted' flag as 0, assuming the video is playable
-                                corrupted = 0
-
-                                # Check if the video is playable using OpenCV
-                                try:
-                                    cap = cv2.VideoCapture(video_path)
-                                    if not cap.isOpened():
-                                        corrupted = 1
-                                except Exception as e:
-                                    print(f"Error while reading video '{video_file}': {e}")
-                                    corrupted = 1
-                                finally:
-                                    cap.release()
-
-                                # Append the video data to the list
-                                video_data.append({
-                                    'Video_ID': video_file,
-                                    'corrupted file': corrupted,
-                                    'drone id': subfolder_name,
-                                    'section': folder_name
-                                })
+                                videos.append((video_file, os.path.join(subfolder_path, video_file), subfolder_name, folder_name))
+
+        return videos
+
+    def check_playable_videos(self):
+        videos = self.find_videos()
+        video_paths = [video_path for video_file, video_path, subfolder_name, folder_name in videos]
+
+        # Reuse the verdicts of the videos that did not change since they were checked at this level
+        level = f'deep{self.samples}' if self.samples else 'container'
+        results = [self.cache.load(video_path, level) if self.cache is not None else None for video_path in video_paths]
+        missing = [video_path for video_path, result in zip(video_paths, results) if result is None]
+
+        # Checking a video mostly waits on the disk and OpenCV releases the GIL, so threads are usually enough.
+        # map returns the results in the order of the videos whatever the number of workers.
+        # The deep check decodes every video in a process of its own, so the threads only wait for those processes
+        check = partial(check_video, samples=self.samples, budget=self.budget)
+        if self.workers > 1 and len(missing) > 1:
+            executor = ProcessPoolExecutor if self.processes and not self.samples else ThreadPoolExecutor
+            with executor(max_workers=self.workers) as pool:
+                checked = list(pool.map(check, missing))
+        else:
+            checked = [check(video_path) for video_path in missing]
+
+        checked = iter(checked)
+        for i, video_path in enumerate(video_paths):
+            if results[i] is None:
+                results[i] = next(checked)
+
+                # A deep check cut short by its budget or a crash says nothing about the video, it is tried again next time
+                if self.cache is not None and results[i][0] is not None:
+                    self.cache.store(video_path, level, results[i])
+
+        if self.cache is not None:
+            self.cache.save()
+
+        # Verdict of every video, kept for the catalog
+        self.verdicts = {video_path: {'corrupted': corrupted, 'error': error, **result} for video_path, (corrupted, error, result) in zip(video_paths, results)}
+        self.level = level
+
+        # Append the video data to the list
+        video_data = []
+        for (video_file, video_path, subfolder_name, folder_name), (corrupted, error, result) in zip(videos, results):
+            row = {
+                'Video_ID': video_file,
+                'corrupted file': corrupted,
+                'drone id': subfolder_name,
+                'section': folder_name,
+                'error': error
+            }
+
+            # Frame count, fps, duration and first undecodable frame of the deep check, and if it could not finish
+            if self.samples:
+                row['check failed'] = int(corrupted is None)
+                for column in ('frame count', 'fps', 'duration', 'first bad frame', 'first bad time'):
+                    row[column] = result.get(column)
+
+            video_data.append(row)
 
         # Create a DataFrame from the video data
         df = pd.DataFrame(video_data)
@@ -61,8 +576,17 @@ class VideoChecker:
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('root_folder', nargs='?', help='Root folder location')
+    parser.add_argument('--workers', type=int, default=1, help='Number of videos checked at the same time (default is 1)')
+    parser.add_argument('--processes', action='store_true', help='Check the videos in processes instead of threads')
+    parser.add_argument('--deep', type=int, nargs='?', const=DEEP_CHECK_SAMPLES, default=0, help=f'Also decode DEEP evenly spaced frames of every complete video with OpenCV (default is {DEEP_CHECK_SAMPLES})')
+    parser.add_argument('--cache', help='JSON file keeping the verdicts between runs, so only new or changed videos are checked')
+    parser.add_argument('--catalog', help='SQLite catalog the verdicts are saved to, shared with srtanalyzer and Renaming')
+    parser.add_argument('--budget', type=float, default=DEEP_CHECK_BUDGET, help=f'Seconds the deep check of one video may take (default is {DEEP_CHECK_BUDGET})')
     args = parser.parse_args()
 
+    if args.deep and cv2 is None:
+        parser.error('--deep needs OpenCV (cv2)')
+
     # If root folder is not provided as an argument, ask the user for input
     if not args.root_folder:
         args.root_folder = input("Enter the root folder location: ")
@@ -72,10 +596,15 @@ def main():
         print("The specified folder does not exist. Please provide a valid folder path.")
         return
 
-    video_checker = VideoChecker(args.root_folder)
+    video_checker = VideoChecker(args.root_folder, args.workers, args.processes, args.deep, args.budget, VideoCache(args.cache) if args.cache else None)
     result_dataframe = video_checker.check_playable_videos()
     print(result_dataframe)
 
+    if args.catalog:
+        catalog = Catalog(args.catalog)
+        catalog.add_verdicts(video_checker.verdicts, video_checker.level)
+        catalog.close()
+
 if __name__ == "__main__":
     main()
 